@@ -0,0 +1,239 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pygame
+
+import pyganim
+from atlas import TextureAtlas
+from sprite_cache import SpriteCache
+
+
+class AnimationLibrary:
+    """Process-wide store of animation frames, shared by every actor.
+
+    Each (file, slicing) combination is loaded once, and its frames are only
+    flipped once for every mirrored animation of it. Actors get their own
+    PygAnimation playback handles, which only hold references to the shared
+    frames. Frame sets are reference counted by handle, and sets
+    no handle uses anymore are dropped by evict_unused(), e.g. when a level unloads.
+
+    Sheets packed with build_atlas() hand out their frames, and their mirrored
+    frames, as subsurfaces of one shared atlas surface instead. An atlas is
+    dropped by evict_unused() once none of its sheets is in use.
+    """
+    def __init__(self, sprite_cache=None):
+        self.sprite_cache = sprite_cache if sprite_cache is not None else SpriteCache()
+        self._frames = {}
+        self._mirror_caches = {}
+        self._ref_counts = {}
+        self._handles = {}
+        self._lock = threading.RLock()
+        self._executor = None
+        self._prefetches = {}
+        self.atlases = []
+
+    def __len__(self):
+        return len(self._frames)
+
+    def _get_frames(self, key):
+        # Internal method. Returns the frames for key, loading them on a miss.
+        frames = self._frames.get(key)
+        if frames is None:
+            filename, rows, cols = key
+            frames = self._get_atlas_frames(key)
+            if frames is None:
+                frames = self.sprite_cache.get_images(filename, rows=rows, cols=cols)
+                # Sets are loaded on first use, so new cache entries are saved right away
+                self.sprite_cache.save()
+            self._frames[key] = frames
+            self._ref_counts.setdefault(key, 0)
+        return frames
+
+    def _get_atlas_frames(self, sheet):
+        # Internal method. Returns the frames of sheet from the atlas it was packed in, if any.
+        for atlas in self.atlases:
+            if sheet in atlas:
+                return atlas.get_frames(sheet)
+        return None
+
+    @staticmethod
+    def _get_mirrored_name(sheet):
+        # Internal method. Returns the atlas name of the mirrored frames of sheet.
+        return sheet + ('mirrored',)
+
+    def build_atlas(self, sheets):
+        """Packs the frames of sheets, (filename, rows, cols) tuples, into a single atlas.
+
+        The frames are packed both as they are and mirrored horizontally, so
+        mirrored animations of the sheets draw from the atlas as well. Sheets
+        that are already part of an atlas are skipped.
+        """
+        with self._lock:
+            sheets = [sheet for sheet in dict.fromkeys(sheets) if self._get_atlas_frames(sheet) is None]
+            if not sheets:
+                return
+            frame_sets = {}
+            for sheet in sheets:
+                filename, rows, cols = sheet
+                frames = self.sprite_cache.get_images(filename, rows=rows, cols=cols)
+                frame_sets[sheet] = frames
+                frame_sets[self._get_mirrored_name(sheet)] = [
+                    pygame.transform.flip(frame, True, False) for frame in frames
+                ]
+            self.sprite_cache.save()
+            self.atlases.append(TextureAtlas.from_frame_sets(frame_sets))
+
+    def _add_handle(self, handle, key):
+        # Internal method. Counts handle as a user of the frames of key.
+        self._ref_counts[key] += 1
+        self._handles[handle] = key
+        return handle
+
+    def acquire(self, filename, rows=1, cols=1, time=.1, loop=True):
+        """Returns a new animation of the sheet frames, each lasting time seconds."""
+        key = (filename, rows, cols)
+        with self._lock:
+            frames = self._get_frames(key)
+            return self._add_handle(pyganim.PygAnimation([(frame, time) for frame in frames], loop=loop), key)
+
+    def acquire_mirrored(self, animation):
+        """Returns a new animation showing the frames of animation mirrored horizontally.
+
+        Every mirrored animation of the same frames shares one cache of the
+        flipped frames, so each frame is only flipped once.
+        """
+        with self._lock:
+            key = self._handles[animation]
+            cache = self._mirror_caches.get(key)
+            if cache is None:
+                cache = OrderedDict()
+                # Sheets packed in an atlas have their mirrored frames there already
+                mirrored_frames = self._get_atlas_frames(self._get_mirrored_name(key))
+                if mirrored_frames is not None:
+                    cache.update(zip(self._frames[key], mirrored_frames))
+                self._mirror_caches[key] = cache
+            mirrored = animation.get_mirrored(cache_size=len(self._frames[key]), cache=cache)
+            return self._add_handle(mirrored, key)
+
+    def release(self, *animations):
+        with self._lock:
+            for animation in animations:
+                key = self._handles.pop(animation, None)
+                if key is not None:
+                    self._ref_counts[key] -= 1
+
+    def evict_unused(self):
+        """Drops every frame set, and every atlas, that no animation handle refers to anymore."""
+        with self._lock:
+            for key, ref_count in list(self._ref_counts.items()):
+                if ref_count == 0:
+                    del self._ref_counts[key]
+                    del self._frames[key]
+                    self._mirror_caches.pop(key, None)
+            self.atlases = [
+                atlas for atlas in self.atlases
+                if any(name in self._frames for name in atlas.manifest)
+            ]
+
+    def prefetch(self, *lazy_animations):
+        """Loads lazy animations on a background thread."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        for lazy_animation in lazy_animations:
+            if not lazy_animation.loaded and lazy_animation not in self._prefetches:
+                future = self._executor.submit(lazy_animation.prefetch)
+                self._prefetches[lazy_animation] = future
+                future.add_done_callback(
+                    lambda _, lazy_animation=lazy_animation: self._prefetches.pop(lazy_animation, None)
+                )
+
+    def cancel_prefetch(self, *lazy_animations):
+        """Cancels the queued prefetches of lazy animations and waits for the running one."""
+        futures = [self._prefetches.pop(lazy_animation, None) for lazy_animation in lazy_animations]
+        wait([future for future in futures if future is not None and not future.cancel()])
+
+
+class LazyAnimation:
+    """Stand-in for a library animation that's only acquired when first loaded."""
+    def __init__(self, library, filename, rows=1, cols=1, time=.1, loop=True):
+        self.library = library
+        self.args = (filename, rows, cols, time, loop)
+        self.animation = None
+        self.closed = False
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self.animation is not None
+
+    def load(self):
+        """Returns the animation, acquiring it from the library on the first call."""
+        if self.animation is None:
+            with self._lock:
+                if self.closed:
+                    raise RuntimeError("Can't load a released animation")
+                if self.animation is None:
+                    self.animation = self.library.acquire(*self.args)
+        return self.animation
+
+    def prefetch(self):
+        # Loads the animation from the prefetch thread, unless it was released in the meantime
+        with self._lock:
+            if not self.closed:
+                self.load()
+
+    def mirrored(self):
+        """Returns a lazy mirrored view of this animation, see PygAnimation.get_mirrored()."""
+        return LazyMirroredAnimation(self)
+
+    def release(self):
+        # Released animations can't be loaded again, so a late prefetch can't
+        # acquire frames nobody would release
+        with self._lock:
+            self.closed = True
+            if self.animation is not None:
+                self.library.release(self.animation)
+                self.animation = None
+
+
+class LazyMirroredAnimation:
+    """Stand-in for the horizontally mirrored view of a lazy animation.
+
+    The view shares the frames and timing tables of its source animation and
+    only flips the frames that are actually shown, once for every view of the
+    same frames, see AnimationLibrary.acquire_mirrored().
+    """
+    def __init__(self, source):
+        self.source = source
+        self.animation = None
+        self.closed = False
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self.animation is not None
+
+    def load(self):
+        if self.animation is None:
+            with self._lock:
+                if self.closed:
+                    raise RuntimeError("Can't load a released animation")
+                if self.animation is None:
+                    self.animation = self.source.library.acquire_mirrored(self.source.load())
+        return self.animation
+
+    def prefetch(self):
+        with self._lock:
+            if not self.closed and not self.source.closed:
+                self.load()
+
+    def release(self):
+        with self._lock:
+            self.closed = True
+            if self.animation is not None:
+                self.source.library.release(self.animation)
+                self.animation = None
+
+
+library = AnimationLibrary()
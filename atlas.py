@@ -0,0 +1,73 @@
+import pygame
+
+
+# Widest atlas surface packed, in pixels
+MAX_ATLAS_WIDTH = 1024
+
+
+def pack(sizes, max_width=MAX_ATLAS_WIDTH, padding=1):
+    """Packs rectangles of the given sizes into shelves of at most max_width pixels.
+
+    Rectangles are placed tallest first, left to right, starting a new shelf
+    when a row is full. Returns the top left position of every size, in the
+    order given, and the size of the packed area.
+    """
+    positions = [None] * len(sizes)
+    x = y = shelf_height = used_width = 0
+    for i in sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True):
+        width, height = sizes[i]
+        if width > max_width:
+            raise ValueError("Frame of width {} doesn't fit in an atlas {} pixels wide".format(width, max_width))
+        if x + width > max_width:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        positions[i] = (x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+        used_width = max(used_width, x - padding)
+    return positions, (used_width, y + shelf_height)
+
+
+class TextureAtlas:
+    """Single surface holding the frames of several frame sets.
+
+    manifest maps the name of each frame set to the rects of its frames on the
+    atlas surface. Frames are handed out as subsurfaces of the atlas, so every
+    frame of every set shares the same pixel buffer and can be blitted from
+    the atlas surface with the frame rect as area.
+    """
+    def __init__(self, surface, manifest):
+        self.surface = surface
+        self.manifest = manifest
+        self._frames = {}
+
+    @classmethod
+    def from_frame_sets(cls, frame_sets, max_width=MAX_ATLAS_WIDTH, padding=1):
+        """Packs frame_sets, a dict of name to list of Surfaces, into a new atlas."""
+        names = []
+        frames = []
+        for name, frame_set in frame_sets.items():
+            for frame in frame_set:
+                names.append(name)
+                frames.append(frame)
+
+        positions, size = pack([frame.get_size() for frame in frames], max_width, padding)
+        surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        surface.blits(list(zip(frames, positions)), doreturn=False)
+
+        manifest = {name: [] for name in frame_sets}
+        for name, frame, position in zip(names, frames, positions):
+            manifest[name].append(pygame.Rect(position, frame.get_size()))
+        return cls(surface, manifest)
+
+    def __contains__(self, name):
+        return name in self.manifest
+
+    def get_frames(self, name):
+        """Returns the frames of a set as subsurfaces of the atlas."""
+        frames = self._frames.get(name)
+        if frames is None:
+            frames = [self.surface.subsurface(rect) for rect in self.manifest[name]]
+            self._frames[name] = frames
+        return frames
@@ -0,0 +1,79 @@
+"""Benchmark of PygAnimation frame lookup: frame table against the bisect path.
+
+Run with: python bench_animation.py
+"""
+import os
+import random
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+import pyganim
+
+
+FRAMES = 12
+DURATION = .1
+REPEATS = 20
+# Durations of the non-uniform animation checked against the bisect path, all multiples of .1
+NON_UNIFORM_DURATIONS = (.3, .1, .2, .1, .7, .3, .1, .5, .9, .2)
+
+
+def build_animations(count, use_table):
+    surface = pygame.Surface((16, 16))
+    animations = []
+    for _ in range(count):
+        animation = pyganim.PygAnimation([(surface, DURATION)] * FRAMES)
+        if not use_table:
+            # Fall back to the binary search over _start_times
+            animation._frame_table = None
+        animation.play(-random.random())
+        animations.append(animation)
+    return animations
+
+
+def check_frame_lookup(durations):
+    # The frame table and the bisect path must agree on every frame start,
+    # where float error lands the table division just short of a slot, and in between
+    surface = pygame.Surface((16, 16))
+    table_animation = pyganim.PygAnimation([(surface, duration) for duration in durations])
+    assert table_animation._frame_table is not None
+    bisect_animation = table_animation.get_copy()
+    bisect_animation._frame_table = None
+
+    start_times = table_animation._start_times
+    times = start_times + [random.uniform(0, start_times[-1]) for _ in range(1000)]
+    for elapsed in times:
+        assert table_animation._find_frame_num(elapsed) == bisect_animation._find_frame_num(elapsed), elapsed
+
+
+def main():
+    pygame.display.set_mode((1, 1))
+    clock = pyganim.FrameClock()
+    pyganim.set_clock(clock)
+
+    random.seed(0)
+    check_frame_lookup([DURATION] * FRAMES)
+    check_frame_lookup(NON_UNIFORM_DURATIONS)
+
+    print("{:>8} {:>14} {:>14} {:>8}".format("sprites", "bisect (ms)", "table (ms)", "speedup"))
+    for count in (100, 1000, 5000, 10000):
+        random.seed(count)
+        bisect_animations = build_animations(count, use_table=False)
+        random.seed(count)
+        table_animations = build_animations(count, use_table=True)
+
+        clock.tick(1 / 60)
+        assert [a.current_frame_num for a in bisect_animations] == \
+            [a.current_frame_num for a in table_animations]
+
+        bisect = timeit.timeit(lambda: [a.current_frame_num for a in bisect_animations], number=REPEATS)
+        table = timeit.timeit(lambda: [a.current_frame_num for a in table_animations], number=REPEATS)
+        print("{:>8} {:>14.3f} {:>14.3f} {:>7.2f}x".format(
+            count, bisect / REPEATS * 1e3, table / REPEATS * 1e3, bisect / table
+        ))
+
+
+if __name__ == "__main__":
+    main()
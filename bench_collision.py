@@ -0,0 +1,52 @@
+"""Micro-benchmark comparing a linear collision scan against SpatialHash queries.
+
+Run with: python bench_collision.py
+"""
+import os
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from collision import SpatialHash
+
+
+TILE_SIZE = 16
+QUERIES = 1000
+
+
+class _Solid(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        super().__init__()
+        self.rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+
+def build_map(side):
+    # Solid floor on every fourth row, like a stack of long platforms
+    group = pygame.sprite.Group()
+    for y in range(0, side, 4):
+        for x in range(side):
+            group.add(_Solid(x, y))
+    return group
+
+
+def main():
+    player_rect = pygame.Rect(5 * TILE_SIZE, 3 * TILE_SIZE + 8, 38, 48)
+    print("{:>8} {:>8} {:>14} {:>14}".format("map", "tiles", "linear (us)", "hashed (us)"))
+    for side in (25, 50, 100, 200, 400):
+        group = build_map(side)
+        index = SpatialHash(TILE_SIZE)
+        index.add(*group.sprites())
+
+        linear = timeit.timeit(
+            lambda: [s for s in group.sprites() if s.rect.colliderect(player_rect)], number=QUERIES
+        )
+        hashed = timeit.timeit(lambda: index.query(player_rect), number=QUERIES)
+        print("{:>8} {:>8} {:>14.2f} {:>14.2f}".format(
+            "{0}x{0}".format(side), len(group), linear / QUERIES * 1e6, hashed / QUERIES * 1e6
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Headless benchmark of Game/Level/Player driven by scripted input.
+
+Runs the game under the SDL dummy video driver for a number of frames, as fast
+as possible with one physics step per frame, and reports per-phase timings
+(input, animation, collision, draw, debug overlay) as p50/p95/p99 in JSON.
+
+Run with: python bench_game.py --frames 2000 --output timings.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+
+import debug_status
+from input_log import InputReplay
+from physics import BACKENDS
+
+
+# (frames, keys held) pairs, repeated until the requested amount of frames ran
+DEFAULT_SCRIPT = [
+    (30, []),
+    (90, ['K_RIGHT']),
+    (5, ['K_RIGHT', 'K_SPACE']),
+    (60, ['K_RIGHT']),
+    (20, ['K_q']),
+    (90, ['K_LEFT']),
+    (5, ['K_LEFT', 'K_SPACE']),
+    (60, ['K_LEFT']),
+]
+
+PHASES = ('input', 'animation', 'collision', 'draw', 'debug_overlay', 'frame')
+
+
+class ScriptedKeys:
+    """Stands in for pygame.key.get_pressed(), holding the keys of the current script step."""
+    def __init__(self, script):
+        self.steps = []
+        for frames, key_names in script:
+            keys = frozenset(getattr(pygame, name) for name in key_names)
+            self.steps.extend([keys] * frames)
+        self.frame = 0
+        self.pressed = frozenset()
+
+    def advance(self):
+        self.pressed = self.steps[self.frame % len(self.steps)]
+        self.frame += 1
+
+    def __call__(self):
+        return self
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.frames = {phase: [] for phase in PHASES}
+        self.current = dict.fromkeys(PHASES, 0.0)
+
+    def wrap(self, phase, function):
+        # Returns function, adding the time spent in it to phase
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.current[phase] += time.perf_counter() - start
+        return timed
+
+    def end_frame(self):
+        for phase, elapsed in self.current.items():
+            self.frames[phase].append(elapsed)
+        self.current = dict.fromkeys(PHASES, 0.0)
+
+    def report(self):
+        report = {}
+        for phase, timings in self.frames.items():
+            percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+            report[phase] = {
+                'mean_ms': statistics.fmean(timings) * 1e3,
+                'p50_ms': percentiles[49] * 1e3,
+                'p95_ms': percentiles[94] * 1e3,
+                'p99_ms': percentiles[98] * 1e3,
+            }
+        return report
+
+
+def run(frames, script=DEFAULT_SCRIPT, debug=False, dirty_rects=False, replay=None, physics='grid'):
+    debug_status.DEBUG_STATUS = debug
+    # Imported after the debug status is set, as the game modules read it on import
+    from level import Level
+    from level_format import get_compiled_level
+    from main import Game
+    from utils import find_file
+
+    game = Game(dirty_rects=dirty_rects, physics=physics)
+    game.level = Level(get_compiled_level(find_file('testmap.tmx')), game.window, physics)
+    level = game.level
+    player = level.player.sprite
+
+    keys = ScriptedKeys(script)
+    player.key_source = keys if replay is None else InputReplay(replay)
+
+    timer = PhaseTimer()
+    player.get_input = timer.wrap('input', player.get_input)
+    player.check_animation = timer.wrap('animation', player.check_animation)
+    level.physics.step = timer.wrap('collision', level.physics.step)
+    game.draw = timer.wrap('draw', game.draw)
+    level.tilemap.draw = timer.wrap('draw', level.tilemap.draw)
+    player.draw = timer.wrap('draw', player.draw)
+    level.render_queue.flush = timer.wrap('draw', level.render_queue.flush)
+    level.get_debug_messages = timer.wrap('debug_overlay', level.get_debug_messages)
+    level.debug_overlay.update = timer.wrap('debug_overlay', level.debug_overlay.update)
+    level.debug_overlay.draw = timer.wrap('debug_overlay', level.debug_overlay.draw)
+    level.frame_graph.update = timer.wrap('debug_overlay', level.frame_graph.update)
+    level.frame_graph.draw = timer.wrap('debug_overlay', level.frame_graph.draw)
+
+    for _ in range(frames):
+        start = time.perf_counter()
+        pygame.event.pump()
+        keys.advance()
+        rects = game.update(game.timestep)
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        timer.current['frame'] = time.perf_counter() - start
+        timer.end_frame()
+
+    level.unload()
+    pygame.quit()
+
+    return {
+        'frames': frames,
+        'debug': debug,
+        'dirty_rects': dirty_rects,
+        'physics': physics,
+        'phases': timer.report(),
+    }
+
+
+def frame_count(value):
+    # The percentiles of the report need at least two frames
+    frames = int(value)
+    if frames < 2:
+        raise argparse.ArgumentTypeError("at least 2 frames are needed, got {}".format(value))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=frame_count, default=1000)
+    parser.add_argument('--script', help="JSON file with a list of [frames, [key names]] steps")
+    parser.add_argument('--replay', help="input recording to replay instead of the script")
+    parser.add_argument('--debug', action='store_true', help="enable the debug overlay")
+    parser.add_argument('--dirty-rects', action='store_true', help="use the dirty-rect rendering mode")
+    parser.add_argument('--physics', choices=BACKENDS, default='grid', help="physics backend")
+    parser.add_argument('--output', help="file to write the JSON report to, instead of stdout")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script) as file:
+            script = json.load(file)
+
+    report = json.dumps(run(args.frames, script, args.debug, args.dirty_rects, args.replay, args.physics), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == "__main__":
+    main()
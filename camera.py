@@ -0,0 +1,24 @@
+import pygame
+
+
+class Camera:
+    """Viewport over the world, centred on a target and clamped to the world bounds.
+
+    Everything is drawn at its world position minus the camera position, and
+    anything outside the viewport is skipped before it's blitted, so the cost
+    of drawing depends on the screen size and not on the world size.
+    """
+    def __init__(self, size, world_size):
+        self.rect = pygame.Rect((0, 0), size)
+        self.world_rect = pygame.Rect((0, 0), world_size)
+
+    def follow(self, target_rect):
+        self.rect.center = target_rect.center
+        self.rect.clamp_ip(self.world_rect)
+
+    def is_visible(self, rect):
+        return self.rect.colliderect(rect)
+
+    def apply(self, rect):
+        """Returns rect moved from world to screen coordinates."""
+        return rect.move(-self.rect.x, -self.rect.y)
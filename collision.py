@@ -0,0 +1,182 @@
+import math
+from collections import namedtuple
+
+import pygame
+
+
+# Contact of a moving box with a rect. time is the fraction of the movement
+# done before the contact, normal points out of the rect towards the box.
+Hit = namedtuple('Hit', ['time', 'normal', 'rect'])
+
+# Movement left after sliding along this many contacts is dropped
+MAX_SLIDES = 3
+
+
+class SpatialHash:
+    """Uniform grid that buckets sprites by the cells their rect overlaps.
+
+    Queries only test the sprites stored in the cells covered by the query rect,
+    so their cost depends on the size of the rect and not on the amount of sprites.
+    With cell_size equal to the tile size, tiles land in exactly one cell each.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._sprite_cells = {}
+
+    def __len__(self):
+        return len(self._sprite_cells)
+
+    def __contains__(self, sprite):
+        return sprite in self._sprite_cells
+
+    def _get_cells(self, rect):
+        # Internal method. Returns the keys of every cell touched by rect.
+        first_x = rect.left // self.cell_size
+        first_y = rect.top // self.cell_size
+        last_x = max(rect.right - 1, rect.left) // self.cell_size
+        last_y = max(rect.bottom - 1, rect.top) // self.cell_size
+        return [
+            (x, y)
+            for y in range(first_y, last_y + 1)
+            for x in range(first_x, last_x + 1)
+        ]
+
+    def add(self, *sprites):
+        for sprite in sprites:
+            if sprite in self._sprite_cells:
+                self.remove(sprite)
+            cells = self._get_cells(sprite.rect)
+            for cell in cells:
+                self._cells.setdefault(cell, []).append(sprite)
+            self._sprite_cells[sprite] = cells
+
+    def remove(self, *sprites):
+        for sprite in sprites:
+            for cell in self._sprite_cells.pop(sprite, ()):
+                bucket = self._cells[cell]
+                bucket.remove(sprite)
+                if not bucket:
+                    del self._cells[cell]
+
+    def update(self, sprite):
+        """Re-buckets a sprite after its rect moved."""
+        self.add(sprite)
+
+    def query(self, rect):
+        """Returns the sprites whose rect collides with rect, without duplicates."""
+        rect = pygame.Rect(rect)
+        found = {}
+        for cell in self._get_cells(rect):
+            for sprite in self._cells.get(cell, ()):
+                if sprite not in found and sprite.rect.colliderect(rect):
+                    found[sprite] = None
+        return list(found)
+
+
+def _get_axis_times(start, size, delta, low, high):
+    # Internal function. Returns when a segment of size starting at start and
+    # moving by delta starts and stops overlapping low..high, as fractions of
+    # delta, or None if it never overlaps.
+    if delta > 0:
+        return (low - (start + size)) / delta, (high - start) / delta
+    if delta < 0:
+        return (high - start) / delta, (low - (start + size)) / delta
+    if start + size <= low or start >= high:
+        return None
+    return -math.inf, math.inf
+
+
+def sweep(position, size, displacement, rect):
+    """Returns the Hit of a box moving by displacement against rect, or None.
+
+    position is the top left of the box and can be fractional. Boxes that
+    already overlap rect at the start of the movement don't hit it.
+    """
+    x_times = _get_axis_times(position[0], size[0], displacement[0], rect.left, rect.right)
+    y_times = _get_axis_times(position[1], size[1], displacement[1], rect.top, rect.bottom)
+    if x_times is None or y_times is None:
+        return None
+
+    entry = max(x_times[0], y_times[0])
+    exit = min(x_times[1], y_times[1])
+    if entry >= exit or not 0 <= entry <= 1:
+        return None
+
+    if x_times[0] > y_times[0]:
+        normal = pygame.math.Vector2(-math.copysign(1, displacement[0]), 0)
+    else:
+        normal = pygame.math.Vector2(0, -math.copysign(1, displacement[1]))
+    return Hit(entry, normal, rect)
+
+
+def push_out(rect, get_rects):
+    """Returns rect moved out of the rects get_rects(area) returns, if it overlaps any.
+
+    Tries the shortest push up, down, left and right past every overlapping
+    rect, in order of length, and takes the first one that leaves rect free.
+    """
+    overlapping = [other for other in get_rects(rect) if other.colliderect(rect)]
+    if not overlapping:
+        return rect
+
+    candidates = sorted([
+        rect.move(0, min(other.top for other in overlapping) - rect.bottom),
+        rect.move(0, max(other.bottom for other in overlapping) - rect.top),
+        rect.move(min(other.left for other in overlapping) - rect.right, 0),
+        rect.move(max(other.right for other in overlapping) - rect.left, 0),
+    ], key=lambda candidate: abs(candidate.x - rect.x) + abs(candidate.y - rect.y))
+    for candidate in candidates:
+        if not any(other.colliderect(candidate) for other in get_rects(candidate)):
+            return candidate
+    return candidates[0]
+
+
+def move_and_slide(position, size, displacement, get_rects, max_slides=MAX_SLIDES):
+    """Moves a box by displacement without passing through any rect, sliding along the ones it hits.
+
+    get_rects(area) returns the solid rects inside area, which covers the whole
+    path of the box, so fast boxes can't tunnel through thin rects however long
+    the movement. Returns the new position and the Hits of the movement, with
+    their time relative to the whole displacement.
+    """
+    position = pygame.math.Vector2(position)
+    remaining = pygame.math.Vector2(displacement)
+    width, height = size
+    hits = []
+    elapsed = 0.0
+
+    for _ in range(max_slides + 1):
+        if not remaining:
+            break
+        end = position + remaining
+        left = math.floor(min(position.x, end.x)) - 1
+        top = math.floor(min(position.y, end.y)) - 1
+        area = pygame.Rect(
+            left, top,
+            math.ceil(max(position.x, end.x) + width) + 1 - left,
+            math.ceil(max(position.y, end.y) + height) + 1 - top
+        )
+
+        hit = None
+        for rect in get_rects(area):
+            rect_hit = sweep(position, size, remaining, rect)
+            if rect_hit is not None and (hit is None or rect_hit.time < hit.time):
+                hit = rect_hit
+        if hit is None:
+            position += remaining
+            break
+
+        # Move up to the contact, snapped to the rect edge so rounding errors
+        # never leave the box inside it, and slide along the rest of the way
+        position += remaining * hit.time
+        if hit.normal.x:
+            position.x = hit.rect.right if hit.normal.x > 0 else hit.rect.left - width
+            remaining.x = 0
+        else:
+            position.y = hit.rect.bottom if hit.normal.y > 0 else hit.rect.top - height
+            remaining.y = 0
+        remaining *= 1 - hit.time
+        hits.append(hit._replace(time=elapsed + hit.time * (1 - elapsed)))
+        elapsed = hits[-1].time
+    return position, hits
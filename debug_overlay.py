@@ -0,0 +1,114 @@
+import pygame
+
+
+class DebugOverlay:
+    """Draws debug messages as right-aligned lines on a single cached overlay surface.
+
+    Rendered text surfaces are cached by string, and a line is only re-rendered
+    and re-composited onto the overlay when its value changed since the last frame.
+    Drawing the overlay is then a single blit regardless of the amount of lines.
+    """
+    def __init__(self, size, x=780, line_height=18, font_size=20, cache_size=512):
+        self.font = pygame.font.Font(None, font_size)
+        self.x = x
+        self.line_height = line_height
+        self.cache_size = cache_size
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.max_lines = size[1] // line_height
+
+        self._text_cache = {}
+        self._values = []
+        self._rects = []
+
+    def render_text(self, text):
+        """Returns the rendered surface for text, rendering it only on a cache miss."""
+        text_surf = self._text_cache.get(text)
+        if text_surf is None:
+            if len(self._text_cache) >= self.cache_size:
+                # Dicts keep insertion order, so this drops the oldest entry
+                del self._text_cache[next(iter(self._text_cache))]
+            text_surf = self.font.render(text, True, 'white', 'black')
+            self._text_cache[text] = text_surf
+        return text_surf
+
+    def update(self, messages):
+        """Re-composites the lines of messages whose value changed.
+
+        Returns the overlay areas that were cleared or redrawn.
+        """
+        messages = messages[:self.max_lines]
+        changed_rects = []
+
+        for i, message in enumerate(messages):
+            if i < len(self._values):
+                if self._values[i] == message:
+                    continue
+                self.surface.fill((0, 0, 0, 0), self._rects[i])
+                changed_rects.append(self._rects[i])
+            text_surf = self.render_text(str(message))
+            rect = text_surf.get_rect(topright=(self.x, i * self.line_height))
+            self.surface.blit(text_surf, rect)
+            changed_rects.append(rect)
+
+            if i < len(self._values):
+                self._values[i] = message
+                self._rects[i] = rect
+            else:
+                self._values.append(message)
+                self._rects.append(rect)
+
+        # Clear the lines that are no longer shown
+        for rect in self._rects[len(messages):]:
+            self.surface.fill((0, 0, 0, 0), rect)
+            changed_rects.append(rect)
+        del self._values[len(messages):]
+        del self._rects[len(messages):]
+
+        return changed_rects
+
+    def draw(self, surface, area=None):
+        # Only the part of the overlay under area is blitted, if given
+        if area is None:
+            surface.blit(self.surface, (0, 0))
+        else:
+            surface.blit(self.surface, area, area)
+
+
+class FrameTimeGraph:
+    """Rolling graph of the recent frame times, labelled with the FPS.
+
+    The dashed line marks target_frame_time and the top of the graph is max_frame_time.
+    """
+    def __init__(self, rect, overlay, target_frame_time=1 / 60, max_frame_time=1 / 20):
+        self.rect = pygame.Rect(rect)
+        self.surface = pygame.Surface(self.rect.size).convert()
+        self.overlay = overlay
+        self.target_frame_time = target_frame_time
+        self.max_frame_time = max_frame_time
+
+    def _get_y(self, frame_time):
+        ratio = min(frame_time / self.max_frame_time, 1.0)
+        return self.rect.height - 1 - round(ratio * (self.rect.height - 1))
+
+    def update(self, frame_times, fps):
+        # The graph is redrawn on its own surface once per frame, see draw()
+        self.surface.fill('black')
+
+        target_y = self._get_y(self.target_frame_time)
+        for x in range(0, self.rect.width, 8):
+            pygame.draw.line(self.surface, 'darkgreen', (x, target_y), (x + 3, target_y))
+
+        if len(frame_times) > 1:
+            step = self.rect.width / (frame_times.maxlen - 1)
+            points = [
+                (round(i * step), self._get_y(frame_time))
+                for i, frame_time in enumerate(frame_times)
+            ]
+            pygame.draw.lines(self.surface, 'yellow', False, points)
+
+        label = self.overlay.render_text("{:.0f} FPS".format(fps))
+        self.surface.blit(label, (4, 4))
+
+    def draw(self, surface, area=None):
+        if area is None or self.rect.colliderect(area):
+            surface.blit(self.surface, self.rect)
@@ -0,0 +1,83 @@
+import struct
+from array import array
+
+import pygame
+
+
+# Keys read by Player.get_input, in the order of their bits in a snapshot
+TRACKED_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE, pygame.K_q)
+
+# File layout: header, the tracked key codes as uint32, then one uint8 bit
+# mask of the pressed keys per physics step.
+MAGIC = b'GVIN'
+VERSION = 1
+HEADER = struct.Struct('<4sHHBI')
+
+
+class KeySnapshot:
+    """Pressed state of the tracked keys, indexed like pygame.key.get_pressed()."""
+    def __init__(self, keys, mask):
+        self.keys = keys
+        self.mask = mask
+
+    def __getitem__(self, key):
+        try:
+            return bool(self.mask >> self.keys.index(key) & 1)
+        except ValueError:
+            return False
+
+
+class InputRecorder:
+    """Key source for Player that records one snapshot per call of the wrapped source.
+
+    Player reads its key source once per physics step, so the recording holds
+    exactly one snapshot per step.
+    """
+    def __init__(self, source=pygame.key.get_pressed, keys=TRACKED_KEYS):
+        self.source = source
+        self.keys = keys
+        self.snapshots = array('B')
+
+    def __call__(self):
+        pressed = self.source()
+        mask = 0
+        for bit, key in enumerate(self.keys):
+            if pressed[key]:
+                mask |= 1 << bit
+        self.snapshots.append(mask)
+        return KeySnapshot(self.keys, mask)
+
+    def save(self, filename, physics_hz):
+        with open(filename, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, physics_hz, len(self.keys), len(self.snapshots)))
+            file.write(struct.pack('<{}I'.format(len(self.keys)), *self.keys))
+            file.write(self.snapshots.tobytes())
+
+
+class InputReplay:
+    """Key source for Player that plays back a recording, one snapshot per call.
+
+    Once the recording is exhausted no key is pressed.
+    """
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            data = file.read()
+        magic, version, self.physics_hz, key_count, frame_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an input recording".format(filename))
+
+        offset = HEADER.size
+        self.keys = struct.unpack_from('<{}I'.format(key_count), data, offset)
+        offset += key_count * 4
+        self.snapshots = array('B')
+        self.snapshots.frombytes(data[offset:offset + frame_count])
+        self.frame = 0
+
+    @property
+    def finished(self):
+        return self.frame >= len(self.snapshots)
+
+    def __call__(self):
+        mask = 0 if self.finished else self.snapshots[self.frame]
+        self.frame += 1
+        return KeySnapshot(self.keys, mask)
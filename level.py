@@ -1,12 +1,23 @@
 import pygame
 
+from animation_library import library
+from camera import Camera
 from player import Player
-from tile import Tile
+from collision import SpatialHash
+from debug_overlay import DebugOverlay, FrameTimeGraph
+from physics import create_backend
+from tilemap import TileMap
 from debug_status import DEBUG_STATUS
+from profiler import profiler
+from render_queue import LAYER_OVERLAY, LAYER_SPRITES, LAYER_TILES, RenderQueue
+
+
+# Name of the TMX layer that holds the solid ground tiles
+COLLISION_LAYER = "Camada de Tiles 1"
 
 
 class Level:
-    def __init__(self, leveldata, window):
+    def __init__(self, leveldata, window, physics='grid'):
         # Level-related data
         self.gravity = -1
         self.level = leveldata
@@ -14,23 +25,37 @@ class Level:
         # Window to draw
         self.window = window
 
-        # Sprites and sprite groups
+        # Map
+        self.tilemap = TileMap(leveldata)
+        self.camera = Camera(self.window.get_size(), self.tilemap.pixel_size)
+
+        # Sprites and sprite groups. Static solid tiles are only stored in the
+        # tilemap arrays, platform only holds the tiles with behaviour
         self.platform = pygame.sprite.Group()
-        self.platform.add(Tile((0, 520), self.window))
+        self.collision_index = SpatialHash(self.tilemap.tile_width)
+        self.collision_index.add(*self.platform.sprites())
         self.player = pygame.sprite.GroupSingle(Player((15, 200), window))
 
+        # Physics
+        self.physics = create_backend(physics, self.tilemap, COLLISION_LAYER, self.collision_index)
+        self.physics.add(self.player.sprite)
+
         # Debug-related info
         self.debug = DEBUG_STATUS
-        self.font = pygame.font.Font(None, 20)
+        self.debug_overlay = DebugOverlay(self.window.get_size())
+        self.frame_graph = FrameTimeGraph((10, self.window.get_height() - 110, 240, 100), self.debug_overlay)
         self.debug_messages = []
 
-    def display_debug(self, info, y=10, x=780):
-        display_surf = pygame.display.get_surface()
-        debug_surf = self.font.render(str(info), True, 'white', 'black')
-        debug_rect = debug_surf.get_rect(topright=(x, y))
-        display_surf.blit(debug_surf, debug_rect)
+        # Drawing state of the current frame
+        self.render_queue = RenderQueue()
+        self.alpha = 1.0
+        self._player_screen_rect = None
 
     def get_debug_messages(self):
+        # Get the phase timings of the last frame
+        for name, elapsed in sorted(profiler.last_frame.items()):
+            self.debug_messages.append("{}: {:.1f} ms".format(name, elapsed * 1000))
+
         # Get player debug messages
         self.debug_messages.append((self.player.sprite.rect.x, self.player.sprite.rect.y))
         self.debug_messages.append([
@@ -40,46 +65,86 @@ class Level:
             self.player.sprite.rect.topleft
         ])
 
-        # Get tile debug messages
-        for sprite in self.platform.sprites():
-            self.debug_messages.append((sprite.rect.x, sprite.rect.y))
-            self.debug_messages.append(sprite.rect.size)
+        # Get debug messages of the solid tiles on screen, only as many as the overlay can show
+        for rect in self.tilemap.get_merged_solid_rects(COLLISION_LAYER, self.camera.rect):
+            if len(self.debug_messages) >= self.debug_overlay.max_lines:
+                break
+            self.debug_messages.append((rect.x, rect.y))
+            self.debug_messages.append(rect.size)
             self.debug_messages.append([
-                sprite.rect.topright,
-                sprite.rect.bottomright,
-                sprite.rect.bottomleft,
-                sprite.rect.topleft
+                rect.topright,
+                rect.bottomright,
+                rect.bottomleft,
+                rect.topleft
             ])
 
-    def vertical_movement_collision(self):
+    def unload(self):
+        # Release the level actors and drop the animation frames nobody uses anymore
+        self.player.sprite.release_animations()
+        library.evict_unused()
+
+    def step(self, dt):
+        # Advance the simulation by one fixed timestep of dt seconds
+        with profiler.timer('player'):
+            self.player.update(dt)
+        with profiler.timer('collision'):
+            self.physics.step(dt)
+
+    def prepare_draw(self, alpha=1.0):
+        """Moves the camera and debug overlay to the next frame.
+
+        alpha is how far the renderer is between the last two physics steps.
+        Returns the screen areas that changed since the previous frame, or None
+        when the whole screen has to be redrawn because the camera moved.
+        """
+        self.alpha = alpha
         player = self.player.sprite
-        player.apply_gravity()
-        collision_sprites = self.platform.sprites()
-
-        for sprite in collision_sprites:
-            if sprite.rect.colliderect(player.rect):
-                if player.direction.y > 0:
-                    player.rect.bottom = sprite.rect.top
-                    player.direction.y = 0
-                    player.on_ground = True
-                elif player.direction.y < 0:
-                    player.rect.top = sprite.rect.bottom
-                    player.direction.y = 0
-                    player.on_ceiling = True
-
-        if player.on_ground and player.direction.y < 0 or player.direction.y > 1:
-            player.on_ground = False
-
-    def update(self):
-        # Update sprites
-        self.platform.draw(self.window)
-        self.player.update()
-        self.vertical_movement_collision()
-        self.player.draw(self.window)
-
-        # Debug messages
+        player_rect = player.get_interpolated_rect(alpha)
+        camera_topleft = self.camera.rect.topleft
+        self.camera.follow(player_rect)
+
+        dirty_rects = []
+        if self.debug:
+            with profiler.timer('debug'):
+                self.get_debug_messages()
+                dirty_rects.extend(self.debug_overlay.update(self.debug_messages))
+                self.debug_messages.clear()
+                self.frame_graph.update(profiler.frame_times, profiler.fps)
+            dirty_rects.append(self.frame_graph.rect)
+
+        player_screen_rect = self.camera.apply(player_rect)
+        previous_screen_rect = self._player_screen_rect
+        self._player_screen_rect = player_screen_rect
+        if previous_screen_rect is None or self.camera.rect.topleft != camera_topleft:
+            return None
+
+        dirty_rects.append(previous_screen_rect.union(player_screen_rect))
+        return dirty_rects
+
+    def draw(self, areas=None):
+        # Draws the frame set up by prepare_draw, only inside areas if given
+        if areas is None:
+            self._draw_area(None)
+            return
+
+        for area in areas:
+            self.window.set_clip(area)
+            self._draw_area(area)
+        self.window.set_clip(None)
+
+    def _draw_area(self, area):
+        # Every subsystem submits its blits to the render queue, which then
+        # draws them layer by layer
+        with profiler.timer('draw_tiles'):
+            self.tilemap.draw(self.render_queue.layer(LAYER_TILES), self.camera.rect, area)
+        with profiler.timer('draw_sprites'):
+            self.player.sprite.draw(self.render_queue.layer(LAYER_SPRITES), self.camera, self.alpha)
         if self.debug:
-            self.get_debug_messages()
-            for i, debug_message in enumerate(self.debug_messages):
-                self.display_debug(debug_message, i * 18)
-            self.debug_messages.clear()
+            # The overlay and graph are rendered once per frame in prepare_draw,
+            # so every dirty area only blits its part of them
+            with profiler.timer('debug'):
+                overlay = self.render_queue.layer(LAYER_OVERLAY)
+                self.debug_overlay.draw(overlay, area)
+                self.frame_graph.draw(overlay, area)
+        with profiler.timer('flush'):
+            self.render_queue.flush(self.window)
@@ -0,0 +1,261 @@
+"""Readers for Tiled maps and the compact binary level format they compile to.
+
+Every reader returns the same map data: a dict with the map width and height
+in tiles, the tile size, the tilesets (see read_tsx) and the layers, in drawing
+order, as arrays of uint16 gids row by row. Compiled levels also carry a
+collision mask per layer, one byte per tile that is 1 where the tile is set.
+
+Compile a map with: python level_format.py assets/maps/testmap.tmx [output.lvl]
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+
+from utils import ROOT_DIR
+
+
+# Tiled stores the flip flags in the three highest bits of a gid
+GID_MASK = 0x1FFFFFFF
+
+LEVEL_EXTENSION = '.lvl'
+LEVEL_CACHE_DIR = os.path.join(ROOT_DIR, '.cache', 'levels')
+
+# File layout: HEADER, then the paths of the files the level was compiled from,
+# per tileset TILESET and its image path, per layer its name and width * height
+# uint16 gids, per layer its name and width * height mask bytes. Names and
+# paths are a uint16 length followed by UTF-8 bytes, paths are relative to the
+# compiled file.
+MAGIC = b'GVLV'
+VERSION = 2
+HEADER = struct.Struct('<4sHHHHHHHH')
+TILESET = struct.Struct('<HHHHH')
+STRING_LENGTH = struct.Struct('<H')
+
+
+def read_tsx(filename, firstgid):
+    root = ET.parse(filename).getroot()
+    image_source = root.find('image').get('source')
+    return {
+        'firstgid': firstgid,
+        'tile_width': int(root.get('tilewidth')),
+        'tile_height': int(root.get('tileheight')),
+        'tilecount': int(root.get('tilecount')),
+        'columns': int(root.get('columns')),
+        'image': os.path.normpath(os.path.join(os.path.dirname(filename), image_source)),
+    }
+
+
+def _make_layer(gids):
+    return array('H', (int(gid) & GID_MASK for gid in gids))
+
+
+def read_tmx(filename):
+    root = ET.parse(filename).getroot()
+    map_dir = os.path.dirname(filename)
+    layers = {}
+    for element in root.iter('layer'):
+        data = element.find('data')
+        if data.get('encoding') != 'csv':
+            raise ValueError("Only CSV encoded layers are supported!")
+        layers[element.get('name')] = _make_layer(gid for gid in data.text.replace('\n', '').split(',') if gid)
+
+    tileset_files = [os.path.join(map_dir, element.get('source')) for element in root.iter('tileset')]
+    return {
+        'width': int(root.get('width')),
+        'height': int(root.get('height')),
+        'tile_width': int(root.get('tilewidth')),
+        'tile_height': int(root.get('tileheight')),
+        'tilesets': [
+            read_tsx(tileset_file, int(element.get('firstgid')))
+            for tileset_file, element in zip(tileset_files, root.iter('tileset'))
+        ],
+        'layers': layers,
+        'collision_masks': {},
+        'dependencies': [filename] + tileset_files,
+    }
+
+
+def read_json(filename):
+    with open(filename) as file:
+        data = json.load(file)
+    map_dir = os.path.dirname(filename)
+    tileset_files = [os.path.join(map_dir, tileset['source']) for tileset in data['tilesets']]
+    return {
+        'width': data['width'],
+        'height': data['height'],
+        'tile_width': data['tilewidth'],
+        'tile_height': data['tileheight'],
+        'tilesets': [
+            read_tsx(tileset_file, tileset['firstgid'])
+            for tileset_file, tileset in zip(tileset_files, data['tilesets'])
+        ],
+        'layers': {
+            layer['name']: _make_layer(layer['data'])
+            for layer in data['layers']
+            if layer['type'] == 'tilelayer'
+        },
+        'collision_masks': {},
+        'dependencies': [filename] + tileset_files,
+    }
+
+
+def _read_string(data, offset):
+    length, = STRING_LENGTH.unpack_from(data, offset)
+    offset += STRING_LENGTH.size
+    return bytes(data[offset:offset + length]).decode(), offset + length
+
+
+def _pack_string(string):
+    encoded = string.encode()
+    return STRING_LENGTH.pack(len(encoded)) + encoded
+
+
+def _read_header(data, filename):
+    # Internal function. Returns the header fields and the dependencies of a
+    # compiled level, and the offset of the data after them.
+    magic, version, *fields, dependency_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a compiled level of version {}".format(filename, VERSION))
+    offset = HEADER.size
+    level_dir = os.path.dirname(filename)
+    dependencies = []
+    for _ in range(dependency_count):
+        dependency, offset = _read_string(data, offset)
+        dependencies.append(os.path.normpath(os.path.join(level_dir, dependency)))
+    return fields, dependencies, offset
+
+
+def read_compiled(filename):
+    with open(filename, 'rb') as file:
+        data = memoryview(file.read())
+    header, dependencies, offset = _read_header(data, filename)
+    width, height, tile_width, tile_height, tileset_count, layer_count = header
+    level_dir = os.path.dirname(filename)
+    tile_count = width * height
+
+    tilesets = []
+    for _ in range(tileset_count):
+        firstgid, tileset_width, tileset_height, tilecount, columns = TILESET.unpack_from(data, offset)
+        image, offset = _read_string(data, offset + TILESET.size)
+        tilesets.append({
+            'firstgid': firstgid,
+            'tile_width': tileset_width,
+            'tile_height': tileset_height,
+            'tilecount': tilecount,
+            'columns': columns,
+            'image': os.path.normpath(os.path.join(level_dir, image)),
+        })
+
+    layers = {}
+    for _ in range(layer_count):
+        name, offset = _read_string(data, offset)
+        layer = array('H')
+        layer.frombytes(data[offset:offset + tile_count * 2])
+        if sys.byteorder != 'little':
+            layer.byteswap()
+        layers[name] = layer
+        offset += tile_count * 2
+
+    collision_masks = {}
+    for _ in range(layer_count):
+        name, offset = _read_string(data, offset)
+        collision_masks[name] = bytes(data[offset:offset + tile_count])
+        offset += tile_count
+
+    return {
+        'width': width,
+        'height': height,
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'tilesets': tilesets,
+        'layers': layers,
+        'collision_masks': collision_masks,
+        'dependencies': dependencies,
+    }
+
+
+def read_map(filename):
+    """Reads a .tmx, Tiled .json or compiled level file, based on its extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.tmx':
+        return read_tmx(filename)
+    elif extension == '.json':
+        return read_json(filename)
+    elif extension == LEVEL_EXTENSION:
+        return read_compiled(filename)
+    raise ValueError("Unknown map format: {}".format(filename))
+
+
+def compile_level(source, destination):
+    """Compiles a .tmx or Tiled .json map into the binary level format."""
+    map_data = read_map(source)
+    level_dir = os.path.dirname(os.path.abspath(destination))
+    parts = [HEADER.pack(
+        MAGIC, VERSION, map_data['width'], map_data['height'], map_data['tile_width'],
+        map_data['tile_height'], len(map_data['tilesets']), len(map_data['layers']),
+        len(map_data['dependencies'])
+    )]
+    for dependency in map_data['dependencies']:
+        parts.append(_pack_string(os.path.relpath(dependency, level_dir)))
+
+    for tileset in map_data['tilesets']:
+        parts.append(TILESET.pack(
+            tileset['firstgid'], tileset['tile_width'], tileset['tile_height'],
+            tileset['tilecount'], tileset['columns']
+        ))
+        parts.append(_pack_string(os.path.relpath(tileset['image'], level_dir)))
+
+    for name, layer in map_data['layers'].items():
+        parts.append(_pack_string(name))
+        if sys.byteorder != 'little':
+            layer = array('H', layer)
+            layer.byteswap()
+        parts.append(layer.tobytes())
+
+    for name, layer in map_data['layers'].items():
+        parts.append(_pack_string(name))
+        parts.append(bytes(1 if gid else 0 for gid in layer))
+
+    os.makedirs(level_dir, exist_ok=True)
+    with open(destination, 'wb') as file:
+        file.write(b''.join(parts))
+
+
+def _is_outdated(filename):
+    # Internal function. Returns whether a compiled level is missing, of another
+    # format version, or older than any of the files it was compiled from.
+    try:
+        with open(filename, 'rb') as file:
+            data = file.read()
+        _, dependencies, _ = _read_header(data, filename)
+        compiled_time = os.path.getmtime(filename)
+        return any(os.path.getmtime(dependency) > compiled_time for dependency in dependencies)
+    except (OSError, ValueError, struct.error):
+        return True
+
+
+def get_compiled_level(source, cache_dir=LEVEL_CACHE_DIR):
+    """Returns the path of the compiled version of source, compiling it if it's missing or outdated.
+
+    Compiled levels are named after the path of source, so maps with the same
+    name in different directories don't share one.
+    """
+    source = os.path.abspath(source)
+    path_hash = hashlib.sha1(os.path.relpath(source, ROOT_DIR).encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(source))[0]
+    destination = os.path.join(cache_dir, '{}-{}{}'.format(name, path_hash, LEVEL_EXTENSION))
+    if _is_outdated(destination):
+        compile_level(source, destination)
+    return destination
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python level_format.py <map.tmx|map.json> [output{}]".format(LEVEL_EXTENSION))
+    source = sys.argv[1]
+    destination = sys.argv[2] if len(sys.argv) == 3 else os.path.splitext(source)[0] + LEVEL_EXTENSION
+    compile_level(source, destination)
@@ -1,38 +1,119 @@
+import argparse
 import sys
 import pygame
+
+import pyganim
+from input_log import InputRecorder, InputReplay
 from level import Level
+from level_format import get_compiled_level
+from physics import BACKENDS
+from profiler import profiler
+from utils import find_file
+
+
+# Rate at which physics is simulated, independent of the display frame rate
+PHYSICS_HZ = 60
+# Physics backend moving the level actors, one of physics.BACKENDS
+PHYSICS_BACKEND = 'grid'
+FPS = 60
+# Frame times above this are clamped, so a long hitch doesn't have to be caught up
+MAX_FRAME_TIME = 0.25
+# Upper bound of physics steps per rendered frame, to avoid a death spiral
+MAX_STEPS_PER_FRAME = 5
+# Only clear and present the screen areas that changed, instead of the whole window
+DIRTY_RECTS = False
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, physics_hz=PHYSICS_HZ, fps=FPS, dirty_rects=DIRTY_RECTS, record=None, replay=None,
+                 physics=PHYSICS_BACKEND):
         pygame.init()
         self.window = pygame.display.set_mode((800, 600), pygame.SCALED)
         pygame.display.set_caption("Gothicvania")
         self.running = True
         self.level = None
         self.clock = pygame.time.Clock()
+        self.dirty_rects = dirty_rects
+        self.physics = physics
+
+        # Fixed timestep
+        self.fps = fps
+        self.physics_hz = physics_hz
+        self.timestep = 1 / physics_hz
+        self.accumulator = 0.0
+
+        # Animations advance with the simulation, one timestep per physics step
+        self.animation_clock = pyganim.FrameClock()
+        pyganim.set_clock(self.animation_clock)
 
-    def update(self):
-        self.draw()
-        self.level.update()
+        # Input recording and replay, both filenames
+        self.record = record
+        self.replay = replay
+        self.input_recorder = None
 
-    def draw(self):
-        self.window.fill('gray')
+    def update(self, frame_time):
+        profiler.end_frame(frame_time)
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+
+        steps = 0
+        while self.accumulator >= self.timestep and steps < MAX_STEPS_PER_FRAME:
+            self.animation_clock.tick(self.timestep)
+            self.level.step(self.timestep)
+            self.accumulator -= self.timestep
+            steps += 1
+
+        # Drop whatever could not be caught up this frame
+        if steps == MAX_STEPS_PER_FRAME:
+            self.accumulator %= self.timestep
+
+        rects = self.level.prepare_draw(self.accumulator / self.timestep)
+        if not self.dirty_rects:
+            rects = None
+        self.draw(rects)
+        self.level.draw(rects)
+        return rects
+
+    def draw(self, rects=None):
+        if rects is None:
+            self.window.fill('gray')
+        else:
+            for rect in rects:
+                self.window.fill('gray', rect)
 
     def start(self):
-        self.level = Level('data', self.window)
+        self.level = Level(get_compiled_level(find_file('testmap.tmx')), self.window, self.physics)
+        player = self.level.player.sprite
+        if self.replay is not None:
+            player.key_source = InputReplay(self.replay)
+            if player.key_source.physics_hz != self.physics_hz:
+                raise ValueError("Recording was made at {} Hz, the game runs at {} Hz".format(
+                    player.key_source.physics_hz, self.physics_hz))
+        elif self.record is not None:
+            self.input_recorder = player.key_source = InputRecorder(player.key_source)
+
         while self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.running = False
 
-            self.clock.tick(60)
-            self.update()
-            pygame.display.flip()
+            frame_time = self.clock.tick(self.fps) / 1000
+            rects = self.update(frame_time)
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
 
+        if self.input_recorder is not None:
+            self.input_recorder.save(self.record, self.physics_hz)
+        self.level.unload()
         pygame.quit()
         sys.exit()
 
 
 if __name__ == "__main__":
-    Game().start()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', help="record the player input to this file")
+    parser.add_argument('--replay', help="replay the player input from this file")
+    parser.add_argument('--physics', choices=BACKENDS, default=PHYSICS_BACKEND, help="physics backend")
+    args = parser.parse_args()
+    Game(record=args.record, replay=args.replay, physics=args.physics).start()
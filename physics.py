@@ -0,0 +1,89 @@
+from collision import move_and_slide, push_out
+
+
+# Name of every physics backend, see create_backend()
+BACKENDS = ('grid', 'pymunk')
+
+
+class PhysicsBackend:
+    """Moves the actors of a level through the solid tiles of one of its layers.
+
+    Actors are sprites like Player: they have a sub-pixel position, a rect
+    sized like their current frame, a direction holding their vertical speed,
+    on_ground and on_ceiling flags, and apply_gravity(dt), get_displacement(dt),
+    move_to(position) and sync_position() methods. Backends integrate and
+    collide every added actor on each step.
+    """
+    def __init__(self, tilemap, layer_name):
+        self.tilemap = tilemap
+        self.layer_name = layer_name
+        self.actors = []
+
+    def add(self, *actors):
+        self.actors.extend(actors)
+
+    def remove(self, *actors):
+        for actor in actors:
+            self.actors.remove(actor)
+
+    def step(self, dt):
+        raise NotImplementedError
+
+
+class GridPhysics(PhysicsBackend):
+    """Sweeps actors against the tile grid, see collision.move_and_slide().
+
+    Actors collide with the solid tiles merged into larger rects, see
+    TileMap.get_merged_solid_rects(), and with the sprites of collision_index,
+    the tiles with behaviour.
+    """
+    def __init__(self, tilemap, layer_name, collision_index=None):
+        super().__init__(tilemap, layer_name)
+        self.collision_index = collision_index
+        # Merge the solid tiles while the level loads rather than on the first step
+        tilemap.get_merged_solid_rects(layer_name)
+
+    def get_collision_rects(self, area):
+        rects = self.tilemap.get_merged_solid_rects(self.layer_name, area)
+        if self.collision_index is not None:
+            rects.extend(sprite.rect for sprite in self.collision_index.query(area))
+        return rects
+
+    def resolve_overlaps(self, actor):
+        # The rect of an actor takes the size of its current animation frame,
+        # so it can grow into a solid tile between steps
+        rect = push_out(actor.rect, self.get_collision_rects)
+        if rect != actor.rect:
+            actor.rect = rect
+            actor.sync_position()
+
+    def step(self, dt):
+        # Actors are swept along their whole step on both axes, so they stop at
+        # the first solid tile in their way however far they move in one step
+        for actor in self.actors:
+            actor.apply_gravity(dt)
+            self.resolve_overlaps(actor)
+            position, hits = move_and_slide(
+                actor.position, actor.rect.size, actor.get_displacement(dt), self.get_collision_rects
+            )
+            actor.move_to(position)
+
+            actor.on_ground = actor.on_ceiling = False
+            for hit in hits:
+                if hit.normal.y:
+                    actor.direction.y = 0
+                    if hit.normal.y < 0:
+                        actor.on_ground = True
+                    else:
+                        actor.on_ceiling = True
+
+
+def create_backend(name, tilemap, layer_name, collision_index=None):
+    """Returns a new backend of one of the BACKENDS colliding with the solid tiles of layer_name."""
+    if name == 'grid':
+        return GridPhysics(tilemap, layer_name, collision_index)
+    elif name == 'pymunk':
+        # Only imported when used, so the grid backend works without pymunk installed
+        from pymunk_physics import PymunkPhysics
+        return PymunkPhysics(tilemap, layer_name)
+    raise ValueError("Unknown physics backend: {}".format(name))
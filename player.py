@@ -2,32 +2,60 @@ import pygame
 from pygame.sprite import AbstractGroup
 
 import pyganim
+from animation_library import LazyAnimation, library
 from debug_status import DEBUG_STATUS
 from utils import find_file
 
 
+# Animations likely to be shown after each animation, prefetched in the background
+NEXT_ANIMATIONS = {
+    "idle": ("run", "jump", "attack"),
+    "run": ("idle", "jump", "attack"),
+    "jump": ("idle", "run"),
+    "attack": ("idle", "run"),
+}
+
+# Pack every animation into a texture atlas when a Player is created, instead
+# of loading each one when it's first shown. Shortens the time to the first
+# frame when False, and draws every frame from a single surface when True.
+USE_ATLAS = False
+
+
 class Player(pygame.sprite.Sprite):
-    def __init__(self, pos, window: pygame.Surface, *groups: AbstractGroup):
+    def __init__(self, pos, window: pygame.Surface, *groups: AbstractGroup, atlas=USE_ATLAS):
         super().__init__(*groups)
         self.window = window
 
-        # Animations
+        # Animations, shared with every other Player through the animation library.
+        # They are either loaded when first shown, with the likely next ones
+        # prefetched in the background, or all packed up front into a texture
+        # atlas when atlas is True.
+        self.prefetch = not atlas
         self.animations = self._get_images()
+        if atlas:
+            library.build_atlas(animation.args[:3] for animation in self.animations.values())
         self._get_left_images()
-        self.current_animation = self.animations["idle_right"]
+        self.current_animation_key = "idle_right"
+        self.current_animation = self.animations["idle_right"].load()
+        self._prefetch_next_animations("idle")
 
         # Player Sprite and Rect
         self.image = self.current_animation.get_current_frame()
         self.rect = self.image.get_rect(bottomleft=pos)
 
+        # Sub-pixel position, and the position before the last physics step
+        # so drawing can interpolate between the two
+        self.position = pygame.math.Vector2(self.rect.topleft)
+        self.previous_position = pygame.math.Vector2(self.position)
+
         # Collision
         self.debug_rect = pygame.Rect(self.rect.topleft, (38, self.rect.height))
-        self.collision_debug = pygame.Surface(self.debug_rect.size)
+        self.collision_debug = pygame.Surface((0, 0))
 
-        # Player variables
-        self.player_speed = 5.0
-        self.gravity = 0.8
-        self.jump_speed = -20
+        # Player variables, in pixels per second (squared for gravity)
+        self.player_speed = 300.0
+        self.gravity = 2880.0
+        self.jump_speed = -1200.0
         self.direction = pygame.math.Vector2(0, 0)
 
         # Player status
@@ -38,6 +66,10 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = False
         self.on_ceiling = False
 
+        # Callable returning the pressed state of every key, can be replaced
+        # to feed the player scripted input
+        self.key_source = pygame.key.get_pressed
+
         # Debug status
         self.debug = DEBUG_STATUS
 
@@ -59,7 +91,7 @@ class Player(pygame.sprite.Sprite):
             "attack_right": self._divide_spritesheet(find_file('gothic-hero-attack.png'), cols=6, time=.05, loop=False),
             "hurt_right": self._divide_spritesheet(find_file('gothic-hero-hurt.png'), cols=3, loop=False),
             "jump_attack_right": self._divide_spritesheet(find_file('gothic-hero-jump-attack.png'), cols=6, loop=False),
-            "jump_climb_right": self._divide_spritesheet(find_file('gothic-hero-jump.png'), cols=7, loop=False),
+            "jump_climb_right": self._divide_spritesheet(find_file('gothic-hero-jump-climb.png'), cols=7, loop=False),
         }
 
     def _get_left_images(self):
@@ -67,12 +99,17 @@ class Player(pygame.sprite.Sprite):
         animations = {}
         for animation_key, animation in self.animations.items():
             new_key = animation_key.replace("right", "left")
-            animations[new_key] = animation.get_copy()
-            animations[new_key].flip(True, False)
-            animations[new_key].make_transforms_permanent()
+            animations[new_key] = animation.mirrored()
 
         self.animations.update(animations)
 
+    def release_animations(self):
+        """Gives the player animations back to the animation library."""
+        library.cancel_prefetch(*self.animations.values())
+        for animation in self.animations.values():
+            animation.release()
+        self.animations.clear()
+
     @staticmethod
     def extract_images(image, rows=1, cols=1):
         return pyganim.get_images_from_sprite_sheet(image, rows=rows, cols=cols)
@@ -106,21 +143,31 @@ class Player(pygame.sprite.Sprite):
         return pyganim.PygAnimation(frames, loop=loop)
 
     def _divide_spritesheet(self, image, rows=1, cols=None, time=.1, loop=True):
-        """Get images from spritesheet, turning them into Pyganimation object."""
-        images = self.extract_images(image, rows, cols)
-        frames = [(img, time) for img in images]
-        return pyganim.PygAnimation(frames, loop=loop)
+        """Get images from spritesheet, turning them into a lazily loaded Pyganimation object."""
+        return LazyAnimation(library, image, rows, cols, time=time, loop=loop)
+
+    def _prefetch_next_animations(self, animation):
+        if self.prefetch:
+            library.prefetch(*(
+                self.animations["{}_{}".format(next_animation, direction)]
+                for next_animation in NEXT_ANIMATIONS.get(animation, ())
+                for direction in ("right", "left")
+            ))
 
     def set_animation(self, animation):
         if self.facing_right:
-            animation = "{}_right".format(animation)
+            animation_key = "{}_right".format(animation)
         else:
-            animation = "{}_left".format(animation)
+            animation_key = "{}_left".format(animation)
 
-        self.current_animation = self.animations[animation]
+        lazy_animation = self.animations[animation_key]
+        if not lazy_animation.loaded:
+            self._prefetch_next_animations(animation)
+        self.current_animation_key = animation_key
+        self.current_animation = lazy_animation.load()
 
     def get_input(self):
-        keys = pygame.key.get_pressed()
+        keys = self.key_source()
 
         if not self.attacking:
             if keys[pygame.K_RIGHT]:
@@ -160,29 +207,42 @@ class Player(pygame.sprite.Sprite):
 
         self.rect.size = self.image.get_size()
 
-    def apply_gravity(self):
-        self.direction.y += self.gravity
-        self.rect.y += self.direction.y
+    def apply_gravity(self, dt):
+        self.direction.y += self.gravity * dt
+
+    def get_displacement(self, dt):
+        """Returns how far the player moves in a physics step of dt seconds, before collisions."""
+        return pygame.math.Vector2(self.direction.x * self.player_speed * dt, self.direction.y * dt)
+
+    def move_to(self, position):
+        self.position.update(position)
+        self.rect.topleft = (round(self.position.x), round(self.position.y))
 
-    def debug_code(self):
+    def sync_position(self):
+        """Copies the rect position back after a collision moved the rect."""
+        self.position.update(self.rect.topleft)
+
+    def debug_code(self, surface, topleft):
+        # The outline is only redrawn when the rect size changes
+        if self.collision_debug.get_size() != self.rect.size:
+            self.collision_debug = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(self.collision_debug, 'red', self.collision_debug.get_rect(), 1)
         self.debug_rect.size = self.rect.size
-        self.debug_rect.x = self.rect.x
-        self.debug_rect.y = self.rect.y
-        self.collision_debug = pygame.Surface(self.debug_rect.size)
-        pygame.draw.rect(self.window, 'red', self.debug_rect, 1)
+        self.debug_rect.topleft = topleft
+        surface.blit(self.collision_debug, self.debug_rect)
 
     def jump(self):
         self.direction.y = self.jump_speed
 
     def check_animation(self):
         if (
-                self.current_animation
+                self.current_animation_key
                 in
                 [
-                    self.animations["attack_right"],
-                    self.animations["attack_left"],
-                    self.animations["jump_right"],
-                    self.animations["jump_left"]
+                    "attack_right",
+                    "attack_left",
+                    "jump_right",
+                    "jump_left"
                 ]
                 and self.current_animation.is_finished()
         ):
@@ -192,13 +252,21 @@ class Player(pygame.sprite.Sprite):
 
         self.image = self.current_animation.get_current_frame()
 
-    def move(self):
-        self.rect.x += self.direction.x * self.player_speed
-
-    def update(self):
+    def update(self, dt):
+        self.previous_position.update(self.position)
         self.get_input()
-        self.move()
         self.check_animation()
+
+    def get_interpolated_rect(self, alpha=1.0):
+        """Returns the rect between the previous and current physics position."""
+        topleft = self.previous_position.lerp(self.position, alpha)
+        return self.image.get_rect(topleft=(round(topleft.x), round(topleft.y)))
+
+    def draw(self, surface, camera, alpha=1.0):
+        rect = self.get_interpolated_rect(alpha)
+        if not camera.is_visible(rect):
+            return
+        screen_rect = camera.apply(rect)
+        surface.blit(self.image, screen_rect)
         if self.debug:
-            self.debug_code()
-        self.window.blit(self.image, self.rect)
+            self.debug_code(surface, screen_rect.topleft)
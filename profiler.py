@@ -0,0 +1,71 @@
+import time
+from collections import deque
+
+from debug_status import DEBUG_STATUS
+
+
+class _NullTimer:
+    # Shared by every timer() call while the profiler is disabled
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _ScopedTimer:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Collects named phase timings per frame and keeps the recent frame times.
+
+    Phases are timed with `with profiler.timer('name'):` blocks. Times of the
+    same phase add up until end_frame(), which moves them to last_frame and
+    stores the frame time in a ring buffer of the last `history` frames.
+    While disabled, timer() returns a shared no-op context manager.
+    """
+    def __init__(self, enabled=DEBUG_STATUS, history=120):
+        self.enabled = enabled
+        self.frame_times = deque(maxlen=history)
+        self.last_frame = {}
+        self._current = {}
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _ScopedTimer(self, name)
+
+    def add(self, name, elapsed):
+        self._current[name] = self._current.get(name, 0.0) + elapsed
+
+    def end_frame(self, frame_time):
+        if not self.enabled:
+            return
+        self.frame_times.append(frame_time)
+        self.last_frame = self._current
+        self._current = {}
+
+    @property
+    def fps(self):
+        if not self.frame_times:
+            return 0.0
+        total = sum(self.frame_times)
+        return len(self.frame_times) / total if total else 0.0
+
+
+profiler = Profiler()
@@ -17,6 +17,7 @@
 
 import pygame
 import time
+from collections import OrderedDict
 
 # setting up constants
 PLAYING = 'playing'
@@ -34,14 +35,95 @@ SOUTHWEST = 'southwest'
 SOUTH = 'south'
 SOUTHEAST = 'southeast'
 
+# Largest frame lookup table built for an animation, in time slots.
+MAX_FRAME_TABLE_SIZE = 1024
 
-def get_images_from_sprite_sheet(filename, width=None, height=None, rows=None, cols=None, rects=None):
+# Default amount of flipped frames kept by a mirrored animation.
+MIRROR_CACHE_SIZE = 16
+
+
+class MonotonicClock(object):
+    # Time source that follows time.monotonic(). This is the default clock, it
+    # can't go backwards when the system time changes.
+    def now(self):
+        return time.monotonic()
+
+
+class FrameClock(object):
+    # Time source that only advances when tick() is called, e.g. once per frame
+    # or physics step by the game loop. Reading it is free, and animations driven
+    # by it can be paused, replayed and stepped deterministically.
+    def __init__(self, start_time=0.0):
+        self.time = start_time
+
+    def now(self):
+        return self.time
+
+    def tick(self, dt):
+        self.time += dt
+
+
+_clock = MonotonicClock()
+
+
+def get_clock():
+    # Returns the clock shared by every animation that wasn't given its own.
+    return _clock
+
+
+def set_clock(clock):
+    # Replaces the clock shared by every animation that wasn't given its own.
+    # The clock must have a now() method returning the time in seconds.
+    global _clock
+    _clock = clock
+
+
+class MirroredFrames(object):
+    # Read-only sequence of the flipped versions of a list of Surface objects.
+    # A flipped frame is only created the first time it's accessed, and kept in
+    # a cache of at most cache_size frames that drops the least recently used
+    # one. Slices share the cache, which is keyed by the original Surface.
+    def __init__(self, frames, xbool=True, ybool=False, cache_size=MIRROR_CACHE_SIZE, cache=None):
+        self._frames = frames
+        self._xbool = xbool
+        self._ybool = ybool
+        self._cache_size = cache_size
+        self._cache = OrderedDict() if cache is None else cache
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __iter__(self):
+        for i in range(len(self._frames)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MirroredFrames(self._frames[index], self._xbool, self._ybool, self._cache_size, self._cache)
+
+        frame = self._frames[index]
+        flipped = self._cache.get(frame)
+        if flipped is None:
+            flipped = pygame.transform.flip(frame, self._xbool, self._ybool)
+            self._cache[frame] = flipped
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(frame)
+        return flipped
+
+
+def get_images_from_sprite_sheet(filename, width=None, height=None, rows=None, cols=None, rects=None, zero_copy=False):
     """Loads several sprites from a single image file (a "spritesheet").
 
     One (and only one) of the following parameters should be specified:
         * width & height of each sprite (all must be the same size)
         * number of rows and columns of sprites (all must be the same size)
         * rects, which is a list of tuples formatted as (pygame.Rect, index) or (left, top, width, height)
+
+    If zero_copy is True, the sprites are subsurfaces of the loaded sheet that
+    share its pixels, instead of separate copies. Drawing on one of them draws
+    on the sheet.
     """
 
     # there should be exactly 1 set of arguments passed (i.e. don't pass width/height AND rows/cols)
@@ -73,7 +155,8 @@ def get_images_from_sprite_sheet(filename, width=None, height=None, rows=None, c
             'Only pass one set of args: width & height, rows & cols, *or* rects')
 
     sheet_image = pygame.image.load(filename).convert_alpha()
-    rects = []
+    if args_type != 'rects':
+        rects = []
     if args_type == 'rows/cols':
         sprite_width = sheet_image.get_width() // cols
         sprite_height = sheet_image.get_height() // rows
@@ -97,11 +180,14 @@ def get_images_from_sprite_sheet(filename, width=None, height=None, rows=None, c
 
                 rects.append((x, y, width, height))
 
+    if zero_copy:
+        return [sheet_image.subsurface(rect) for rect in rects]
+
     # create a list of Surface objects from the sprite sheet
     returned_surfaces = []
     for rect in rects:
-        # create Surface with width/height in rect
-        surf = pygame.Surface((rect[2], rect[3]), 0,
+        # create a transparent Surface with width/height in rect
+        surf = pygame.Surface((rect[2], rect[3]), pygame.SRCALPHA,
                               sheet_image).convert_alpha()
         surf.blit(sheet_image, (0, 0), rect, pygame.BLEND_RGBA_ADD)
         returned_surfaces.append(surf)
@@ -110,7 +196,7 @@ def get_images_from_sprite_sheet(filename, width=None, height=None, rows=None, c
 
 
 class PygAnimation(object):
-    def __init__(self, frames, loop=True):
+    def __init__(self, frames, loop=True, clock=None):
         # Constructor function for the animation object. Starts off in the STOPPED state.
         #
         # @param frames
@@ -120,6 +206,8 @@ class PygAnimation(object):
         #     Note that the images and duration cannot be changed. A new PygAnimation object
         #     will have to be created.
         # @param loop Tells the animation object to keep playing in a loop.
+        # @param clock The time source of this animation. If None, the clock shared
+        #     by all animations (see set_clock()) is used.
 
         # _images stores the pygame.Surface objects of each frame
         self._images = []
@@ -134,10 +222,21 @@ class PygAnimation(object):
         # So self._start_times[-1] tells you the length of the entire animation.
         # e.g. if _durations is [1, 1, 2.5], then _startTimes will be [0, 1, 2, 4.5]
         self._start_times = None
+        # When every duration is a multiple of the same quantum (which is always
+        # the case for uniform durations), _frame_table maps each _quantum long
+        # time slot to its frame number. Finding the current frame is then a
+        # division and a list index instead of a binary search over _start_times.
+        # Both are None when the durations can't be quantized.
+        self._quantum = None
+        self._frame_table = None
 
         # if the sprites are transformed, the originals are kept in _images
         # and the transformed sprites are kept in _transformedImages.
         self._transformed_images = []
+        # Transformations are queued here as (function, args) and applied to
+        # every frame in a single pass when a frame is next needed, so no
+        # intermediate Surfaces are kept between two transformations.
+        self._pending_transforms = []
 
         self._state = STOPPED  # The state is always either PLAYING, PAUSED, or STOPPED
         # If True, the animation will keep looping. If False, the animation stops after playing once.
@@ -146,6 +245,9 @@ class PygAnimation(object):
         # If False, then nothing is drawn when the blit() methods are called
         self._visibility = True
 
+        # the time source, None means the shared module clock
+        self._clock = clock
+
         # the time that the play() function was last called.
         self._playing_start_time = 0
         # the time that the pause() function was last called.
@@ -170,6 +272,13 @@ class PygAnimation(object):
                 self._images.append(frame[0])
                 self._durations.append(frame[1])
             self._start_times = self._get_start_times()
+            self._build_frame_table()
+
+    def _now(self):
+        # Internal method. Returns the current time of this animation's clock.
+        if self._clock is None:
+            return _clock.now()
+        return self._clock.now()
 
     def _get_start_times(self):
         # Internal method to get the start times based off of the _durations list.
@@ -179,12 +288,47 @@ class PygAnimation(object):
             start_times.append(start_times[-1] + self._durations[i])
         return start_times
 
+    def _build_frame_table(self):
+        # Internal method to build _frame_table based off of the _durations list.
+        # Don't call this method.
+        self._quantum = None
+        self._frame_table = None
+        quantum = min(self._durations)
+        frame_table = []
+        for i, duration in enumerate(self._durations):
+            slots = round(duration / quantum)
+            if abs(duration - slots * quantum) > 1e-9:
+                return
+            frame_table.extend([i] * slots)
+            if len(frame_table) > MAX_FRAME_TABLE_SIZE:
+                return
+        self._quantum = quantum
+        self._frame_table = frame_table
+
+    def _find_frame_num(self, elapsed):
+        # Internal method. Returns the frame number shown "elapsed" seconds into
+        # the animation.
+        if self._frame_table is None:
+            return find_start_time(self._start_times, elapsed)
+        # Frames start on multiples of the quantum, which the division can land
+        # just short of, so near-integer slots are snapped up
+        slot = int(elapsed / self._quantum + 1e-9)
+        if slot >= len(self._frame_table):
+            return self.num_frames - 1
+        elif slot < 0:
+            return 0
+        return self._frame_table[slot]
+
     def reverse(self):
         # Reverses the order of the animations.
         self.elapsed = self._start_times[-1] - self.elapsed
-        self._images.reverse()
-        self._transformed_images.reverse()
-        self._durations.reverse()
+        # (the lists are replaced rather than reversed in place, since mirrored
+        # animations share them)
+        self._images = self._images[::-1]
+        self._transformed_images = self._transformed_images[::-1]
+        self._durations = self._durations[::-1]
+        self._start_times = self._get_start_times()
+        self._build_frame_table()
 
     def get_copy(self):
         # Returns a copy of this PygAnimation object, but one that refers to the
@@ -202,17 +346,63 @@ class PygAnimation(object):
         # NOTE: Messing around with the original Surface objects will affect all
         # the copies. If you want to modify the Surface objects, then just make
         # copies using constructor function instead.
+        if self._pending_transforms:
+            self._apply_pending_transforms()
         retval = []
         for _ in range(num_copies):
-            new_anim = PygAnimation('_copy', loop=self.loop)
+            new_anim = PygAnimation('_copy', loop=self.loop, clock=self._clock)
             new_anim._images = self._images[:]
             new_anim._transformed_images = self._transformed_images[:]
             new_anim._durations = self._durations[:]
             new_anim._start_times = self._start_times[:]
+            new_anim._quantum = self._quantum
+            new_anim._frame_table = self._frame_table
             new_anim.num_frames = self.num_frames
             retval.append(new_anim)
         return retval
 
+    def _apply_pending_transforms(self):
+        # Internal method. Runs the queued transformations on every frame,
+        # starting from the already transformed frames if there are any.
+        # Don't call this method.
+        if self._transformed_images == []:
+            frames = self._images
+        else:
+            frames = self._transformed_images
+        transformed_images = []
+        for surf in frames:
+            for function, args in self._pending_transforms:
+                surf = function(surf, *args)
+            transformed_images.append(surf)
+        self._transformed_images = transformed_images
+        self._pending_transforms = []
+
+    def get_mirrored(self, xbool=True, ybool=False, cache_size=MIRROR_CACHE_SIZE, cache=None):
+        # Returns a copy of this PygAnimation object that shows its frames flipped.
+        #
+        # Unlike calling flip() on a copy, the flipped frames are only created
+        # when they are first shown and at most cache_size of them are kept.
+        # The durations and frame lookup tables are shared with this object
+        # instead of being copied.
+        #
+        # cache is an OrderedDict of original to flipped frames. Mirrored
+        # copies of animations with the same frames can pass the same cache to
+        # flip every frame only once between them.
+        if self._pending_transforms:
+            self._apply_pending_transforms()
+        if self._transformed_images == []:
+            frames = self._images
+        else:
+            frames = self._transformed_images
+        new_anim = PygAnimation('_copy', loop=self.loop, clock=self._clock)
+        new_anim._images = MirroredFrames(frames, xbool, ybool, cache_size, cache)
+        new_anim._durations = self._durations
+        new_anim._start_times = self._start_times
+        new_anim._quantum = self._quantum
+        new_anim._frame_table = self._frame_table
+        new_anim.num_frames = self.num_frames
+        return new_anim
+
     def blit(self, dest_surface, dest):
         # Draws the appropriate frame of the animation to the destination Surface
         # at the specified position.
@@ -229,13 +419,15 @@ class PygAnimation(object):
             self.state = STOPPED
         if not self.visibility or self.state == STOPPED:
             return
-        frame_num = find_start_time(self._start_times, self.elapsed)
+        frame_num = self._find_frame_num(self.elapsed)
         dest_surface.blit(self.get_frame(frame_num), dest)
 
     def get_frame(self, frame_num):
         # Returns the pygame.Surface object of the frame_num-th frame in this
         # animation object. If there is a transformed version of the frame,
         # it will return that one.
+        if self._pending_transforms:
+            self._apply_pending_transforms()
         if self._transformed_images == []:
             return self._images[frame_num]
         else:
@@ -256,12 +448,18 @@ class PygAnimation(object):
         # the rotation or scaling functions multiple times results in
         # degraded/noisy images.
         self._transformed_images = []
+        self._pending_transforms = []
 
     def make_transforms_permanent(self):
-        self._images = [pygame.Surface(
-            surf_obj.get_size(), 0, surf_obj) for surf_obj in self._transformed_images]
-        for i in range(len(self._transformed_images)):
-            self._images[i].blit(self._transformed_images[i], (0, 0))
+        # Makes the transformed frames the original frames. The transformed
+        # Surfaces are adopted as they are rather than copied, so only one set
+        # of frames is kept alive afterwards.
+        if self._pending_transforms:
+            self._apply_pending_transforms()
+        if self._transformed_images == []:
+            return
+        self._images = self._transformed_images
+        self._transformed_images = []
 
     def blit_frame_num(self, frame_num, dest_surface, dest):
         # Draws the specified frame of the animation object. This ignores the
@@ -303,7 +501,7 @@ class PygAnimation(object):
             self.state = STOPPED
         if not self.visibility or self.state == STOPPED:
             return
-        frame_num = find_start_time(self._start_times, elapsed)
+        frame_num = self._find_frame_num(elapsed)
         dest_surface.blit(self.get_frame(frame_num), dest)
 
     def is_finished(self):
@@ -318,7 +516,7 @@ class PygAnimation(object):
         # NOTE: Don't adjust the self.state property, only self._state
 
         if start_time is None:
-            start_time = time.time()
+            start_time = self._now()
 
         if self._state == PLAYING:
             if self.is_finished():
@@ -341,16 +539,15 @@ class PygAnimation(object):
         # NOTE: Don't adjust the self.state property, only self._state
 
         if start_time is None:
-            start_time = time.time()
+            start_time = self._now()
 
         if self._state == PAUSED:
             return  # do nothing
         elif self._state == PLAYING:
             self._paused_start_time = start_time
         elif self._state == STOPPED:
-            right_now = time.time()
-            self._playing_start_time = right_now
-            self._paused_start_time = right_now
+            self._playing_start_time = start_time
+            self._paused_start_time = start_time
         self._state = PAUSED
 
     def stop(self):
@@ -422,6 +619,9 @@ class PygAnimation(object):
             # anything, since anchor() sets all the image to the same size.
             # The lesson is, you can only effectively call anchor() once.
 
+        # mirrored frames are read-only, so anchor copies of them
+        self._images = list(self._images)
+
         # clears transforms since this method anchors the original images.
         self.clear_transforms()
 
@@ -502,64 +702,49 @@ class PygAnimation(object):
     def _make_transformed_surfaces_if_needed(self):
         # Internal-method. Creates the Surface objects for the _transformedImages list.
         # Don't call this method.
+        if self._pending_transforms:
+            self._apply_pending_transforms()
         if self._transformed_images == []:
             self._transformed_images = [surf.copy() for surf in self._images]
 
     # Transformation methods.
     # (These are analogous to the pygame.transform.* functions, except they
-    # are applied to all frames of the animation object.
+    # are applied to all frames of the animation object. They are queued and
+    # composed, then applied in one pass per frame when a frame is next needed.)
 
     def flip(self, xbool, ybool):
         # Flips the image horizontally, vertically, or both.
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.flip
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.flip(
-                self.get_frame(i), xbool, ybool)
+        self._pending_transforms.append((pygame.transform.flip, (xbool, ybool)))
 
     def scale(self, width_height):
         # NOTE: Does not support the DestSurface parameter
         # Increases or decreases the size of the images.
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.scale
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.scale(
-                self.get_frame(i), width_height)
+        self._pending_transforms.append((pygame.transform.scale, (width_height,)))
 
     def rotate(self, angle):
         # Rotates the image.
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.rotate
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.rotate(
-                self.get_frame(i), angle)
+        self._pending_transforms.append((pygame.transform.rotate, (angle,)))
 
     def rotozoom(self, angle, scale):
         # Rotates and scales the image simultaneously.
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.rotozoom
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.rotozoom(
-                self.get_frame(i), angle, scale)
+        self._pending_transforms.append((pygame.transform.rotozoom, (angle, scale)))
 
     def scale2x(self):
         # NOTE: Does not support the DestSurface parameter
         # Double the size of the image using an efficient algorithm.
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.scale2x
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.scale2x(
-                self.get_frame(i))
+        self._pending_transforms.append((pygame.transform.scale2x, ()))
 
     def smoothscale(self, width_height):
         # NOTE: Does not support the DestSurface parameter
         # Scales the image smoothly. (Computationally more expensive and
         # slower but produces a better scaled image.)
         # See http://pygame.org/docs/ref/transform.html#pygame.transform.smoothscale
-        self._make_transformed_surfaces_if_needed()
-        for i in range(len(self._images)):
-            self._transformed_images[i] = pygame.transform.smoothscale(
-                self.get_frame(i), width_height)
+        self._pending_transforms.append((pygame.transform.smoothscale, (width_height,)))
 
     # pygame.Surface method wrappers
     # These wrappers call their analogous pygame.Surface methods on all Surface objects in this animation.
@@ -631,7 +816,7 @@ class PygAnimation(object):
             # we need to modify the _playingStartTime so that the rest of
             # the animation will play, and then stop. (Otherwise, the
             # animation will immediately stop playing if it has already looped.)
-            self._playing_start_time = time.time() - self.elapsed
+            self._playing_start_time = self._now() - self.elapsed
         self._loop = bool(loop)
 
     loop = property(_prop_get_loop, _prop_set_loop)
@@ -675,7 +860,7 @@ class PygAnimation(object):
         else:
             elapsed = get_in_between_value(0, elapsed, self._start_times[-1])
 
-        right_now = time.time()
+        right_now = self._now()
         self._playing_start_time = right_now - (elapsed * self.rate)
 
         if self.state in (PAUSED, STOPPED):
@@ -698,7 +883,7 @@ class PygAnimation(object):
             # if playing, then draw the current frame (based on when the animation
             # started playing). If not looping and the animation has gone through
             # all the frames already, then draw the last frame.
-            elapsed = (time.time() - self._playing_start_time) * self.rate
+            elapsed = (self._now() - self._playing_start_time) * self.rate
         elif self._state == PAUSED:
             # if paused, then draw the frame that was playing at the time the
             # PygAnimation object was paused
@@ -716,7 +901,7 @@ class PygAnimation(object):
     def _prop_get_current_frame_num(self):
         # Return the frame number of the frame that will be currently
         # displayed if the animation object were drawn right now.
-        return find_start_time(self._start_times, self.elapsed)
+        return self._find_frame_num(self.elapsed)
 
     def _prop_set_current_frame_num(self, frame_num):
         # Change the elapsed time to the beginning of a specific frame.
@@ -757,16 +942,12 @@ class PygConductor(object):
     animations = property(_prop_get_animations, _prop_set_animations)
 
     def play(self, start_time=None):
-        if start_time is None:
-            start_time = time.time()
-
+        # Without a start_time, each animation reads the time of its own clock
         for anim_obj in self._animations:
             anim_obj.play(start_time)
 
     def pause(self, start_time=None):
-        if start_time is None:
-            start_time = time.time()
-
+        # Without a start_time, each animation reads the time of its own clock
         for anim_obj in self._animations:
             anim_obj.pause(start_time)
 
@@ -0,0 +1,113 @@
+import pymunk
+
+from physics import PhysicsBackend
+
+
+# Contacts whose normal is closer to vertical than this count as floor or ceiling
+GROUND_NORMAL_Y = 0.5
+# Fraction of an overlap resolved on each step. Actors move into the floor a
+# little every step under gravity, so overlaps are pushed out almost at once.
+OVERLAP_CORRECTION = 0.99
+
+
+class PymunkPhysics(PhysicsBackend):
+    """Physics backend running on a pymunk space.
+
+    The outline of the solid tiles is added as a few static segments, merged
+    along every floor, wall and ceiling, and every actor gets a dynamic box
+    body that can't rotate. Broadphase and contact solving then happen in
+    pymunk's C spatial index, which scales to many more moving bodies than
+    sweeping each actor in Python.
+
+    Actors keep their own gravity and speed: each step their velocity is
+    handed to their body, and their position and vertical speed are read back.
+    pymunk moves bodies with the velocity solved on the previous step, so actors
+    trail their input by one step. Tiles with behaviour are not part of the space.
+    """
+    def __init__(self, tilemap, layer_name):
+        super().__init__(tilemap, layer_name)
+        self.space = pymunk.Space()
+        self._bodies = {}
+        self._shapes = {}
+        self._shape_sizes = {}
+        self._velocities = {}
+
+        static_body = self.space.static_body
+        for start, end in tilemap.get_solid_outline(layer_name):
+            segment = pymunk.Segment(static_body, start, end, 0)
+            segment.friction = 0
+            self.space.add(segment)
+
+    def add(self, *actors):
+        super().add(*actors)
+        for actor in actors:
+            body = pymunk.Body(1, float('inf'))
+            body.position = tuple(actor.position)
+            body.velocity_func = self._update_velocity
+            self._bodies[actor] = body
+            self._velocities[body] = (0, 0)
+            self.space.add(body)
+            self._set_shape(actor)
+
+    def remove(self, *actors):
+        super().remove(*actors)
+        for actor in actors:
+            body = self._bodies.pop(actor)
+            self.space.remove(body, self._shapes.pop(actor))
+            del self._velocities[body]
+            del self._shape_sizes[actor]
+
+    def _set_shape(self, actor):
+        # Internal method. Gives the body of actor a box the size of its rect,
+        # with the body position at the top left corner like the actor position.
+        shape = self._shapes.pop(actor, None)
+        if shape is not None:
+            self.space.remove(shape)
+        width, height = actor.rect.size
+        shape = pymunk.Poly(self._bodies[actor], [(0, 0), (width, 0), (width, height), (0, height)])
+        shape.friction = 0
+        self._shapes[actor] = shape
+        self._shape_sizes[actor] = actor.rect.size
+        self.space.add(shape)
+
+    def _update_velocity(self, body, gravity, damping, dt):
+        # Internal method. Replaces pymunk's velocity integration: bodies take
+        # the velocity of their actor, which the contact solver then corrects.
+        # Setting body.velocity before the step instead would move the body
+        # before the solver runs, as pymunk moves bodies first on each step.
+        body.velocity = self._velocities[body]
+
+    def step(self, dt):
+        for actor in self.actors:
+            actor.apply_gravity(dt)
+            body = self._bodies[actor]
+            # The rect of an actor takes the size of its current animation frame
+            if self._shape_sizes[actor] != actor.rect.size:
+                self._set_shape(actor)
+            # Only teleport the body when the actor was moved outside of the space
+            if tuple(actor.position) != tuple(body.position):
+                body.position = tuple(actor.position)
+            self._velocities[body] = tuple(actor.get_displacement(dt) / dt)
+
+        # collision_bias is the fraction of an overlap left unresolved after a second
+        self.space.collision_bias = (1 - OVERLAP_CORRECTION) ** (1 / dt)
+        self.space.step(dt)
+
+        for actor in self.actors:
+            body = self._bodies[actor]
+            actor.move_to(body.position)
+            actor.direction.y = body.velocity.y
+
+            actor.on_ground = actor.on_ceiling = False
+            body.each_arbiter(self._check_contact, actor)
+
+    def _check_contact(self, arbiter, actor):
+        # Internal method. Sets the ground and ceiling flags of actor from one of its contacts.
+        normal_y = arbiter.contact_point_set.normal.y
+        # The normal points from the first shape of the arbiter to the second one
+        if arbiter.shapes[0] is not self._shapes[actor]:
+            normal_y = -normal_y
+        if normal_y > GROUND_NORMAL_Y:
+            actor.on_ground = True
+        elif normal_y < -GROUND_NORMAL_Y:
+            actor.on_ceiling = True
@@ -0,0 +1,62 @@
+import pygame
+
+
+# Draw layers, flushed from the lowest to the highest
+LAYER_TILES = 0
+LAYER_SPRITES = 1
+LAYER_OVERLAY = 2
+
+
+class RenderLayer:
+    """Surface-like front for one layer of a RenderQueue.
+
+    Code written to blit on a Surface can be handed a layer instead, and its
+    blits are collected until the queue is flushed.
+    """
+    def __init__(self):
+        self.items = []
+
+    def blit(self, source, dest, area=None):
+        # Subsurfaces, like atlas frames, are submitted as an area of their
+        # parent, so a layer of atlas frames blits from a single source.
+        parent = source.get_abs_parent()
+        if parent is not source:
+            frame_rect = pygame.Rect(source.get_abs_offset(), source.get_size())
+            if area is None:
+                area = frame_rect
+            else:
+                requested = pygame.Rect(area).move(frame_rect.topleft)
+                area = requested.clip(frame_rect)
+                # Like Surface.blit, what is clipped off the left and top of the
+                # area moves the destination along
+                dest = (dest[0] + area.x - requested.x, dest[1] + area.y - requested.y)
+            source = parent
+
+        if area is None:
+            self.items.append((source, dest))
+        else:
+            self.items.append((source, dest, area))
+
+    def blits(self, blit_sequence, doreturn=False):
+        # Sequences are queued as they are, without looking for subsurfaces
+        self.items.extend(blit_sequence)
+
+
+class RenderQueue:
+    """Collects the blits of every subsystem by layer, then draws each layer
+    with a single Surface.blits call."""
+    def __init__(self):
+        self._layers = {}
+
+    def layer(self, layer):
+        render_layer = self._layers.get(layer)
+        if render_layer is None:
+            render_layer = self._layers[layer] = RenderLayer()
+        return render_layer
+
+    def flush(self, surface):
+        for layer in sorted(self._layers):
+            items = self._layers[layer].items
+            if items:
+                surface.blits(items, doreturn=False)
+                items.clear()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import struct
+
+import pygame
+
+import pyganim
+from utils import ROOT_DIR
+
+
+CACHE_FILE = os.path.join(ROOT_DIR, '.cache', 'sprites.bin')
+
+# File layout: MAGIC, version, index length, JSON index, then the raw RGBA
+# pixels of every frame one after the other.
+MAGIC = b'GVSC'
+VERSION = 2
+HEADER = struct.Struct('<4sHI')
+
+
+class SpriteCache:
+    """On-disk cache of sliced sprite sheet frames.
+
+    Frames are stored as raw RGBA buffers in a single binary file, keyed by the
+    sheet name and slicing parameters and validated against the hash of the
+    source file. The whole cache is loaded with a single read, and every cached
+    frame is created from it with pygame.image.frombuffer instead of decoding
+    and slicing the PNG again.
+    """
+    def __init__(self, filename=CACHE_FILE):
+        self.filename = filename
+        self.dirty = False
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        # Internal method. Reads the index and pixel data of the cache file,
+        # starting with an empty cache if it's missing or unreadable.
+        try:
+            with open(self.filename, 'rb') as file:
+                data = file.read()
+            magic, version, index_size = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                return
+            index = json.loads(data[HEADER.size:HEADER.size + index_size])
+        except (OSError, ValueError, struct.error):
+            return
+
+        pixels = memoryview(data)[HEADER.size + index_size:]
+        for key, entry in index.items():
+            entry['frames'] = [
+                (pixels[offset:offset + width * height * 4], (width, height))
+                for offset, width, height in entry['frames']
+            ]
+            self._entries[key] = entry
+
+    @staticmethod
+    def _get_file_hash(filename):
+        with open(filename, 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()
+
+    def get_images(self, filename, **slicing):
+        """Returns the frames of a sprite sheet, as pyganim.get_images_from_sprite_sheet would.
+
+        The slicing keyword arguments are passed to get_images_from_sprite_sheet
+        on a cache miss and are part of the cache key.
+        """
+        key = '{}|{}'.format(os.path.basename(filename), json.dumps(slicing, sort_keys=True))
+        file_hash = self._get_file_hash(filename)
+        entry = self._entries.get(key)
+
+        if entry is None or entry['hash'] != file_hash:
+            # Frames are only read, never drawn on, so they can share the sheet pixels
+            images = pyganim.get_images_from_sprite_sheet(filename, zero_copy=True, **slicing)
+            self._entries[key] = {
+                'hash': file_hash,
+                'frames': [(pygame.image.tostring(image, 'RGBA'), image.get_size()) for image in images]
+            }
+            self.dirty = True
+            return images
+
+        return [
+            pygame.image.frombuffer(buffer, size, 'RGBA').convert_alpha()
+            for buffer, size in entry['frames']
+        ]
+
+    def save(self):
+        """Writes the cache file if any entry was added or replaced."""
+        if not self.dirty:
+            return
+
+        index = {}
+        blobs = []
+        offset = 0
+        for key, entry in self._entries.items():
+            frames = []
+            for buffer, (width, height) in entry['frames']:
+                frames.append((offset, width, height))
+                blobs.append(buffer)
+                offset += len(buffer)
+            index[key] = {'hash': entry['hash'], 'frames': frames}
+        index_data = json.dumps(index).encode()
+
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(index_data)))
+            file.write(index_data)
+            for blob in blobs:
+                file.write(blob)
+        os.replace(temp_filename, self.filename)
+        self.dirty = False
@@ -20,23 +20,43 @@ class Spritesheet(object):
             print('Unable to load spritesheet image:', filename)
             raise SystemExit(message)
 
-    def image_at(self, rectangle, colorkey=None):
-        """Loads image from x,y,x+offset,y+offset"""
+    def image_at(self, rectangle, colorkey=None, zero_copy=False):
+        """Loads image from x,y,x+offset,y+offset
+
+        With zero_copy the image is a subsurface sharing the sheet pixels
+        instead of an opaque copy.
+        """
         rect = pygame.Rect(rectangle)
-        image = pygame.Surface(rect.size).convert()
-        image.blit(self.sheet, (0, 0), rect)
+        if zero_copy:
+            image = self.sheet.subsurface(rect)
+        else:
+            image = pygame.Surface(rect.size).convert()
+            image.blit(self.sheet, (0, 0), rect)
         if colorkey is not None:
-            if colorkey is -1:
+            if colorkey == -1:
                 colorkey = image.get_at((0,0))
             image.set_colorkey(colorkey, pygame.RLEACCEL)
         return image
 
-    def images_at(self, rects, colorkey=None):
+    def images_at(self, rects, colorkey=None, zero_copy=False):
         """Loads multiple images, supply a list of coordinates"""
-        return [self.image_at(rect, colorkey) for rect in rects]
+        return [self.image_at(rect, colorkey, zero_copy) for rect in rects]
 
-    def load_strip(self, rect, image_count, colorkey=None):
+    def load_strip(self, rect, image_count, colorkey=None, zero_copy=False):
         """Loads a strip of images and returns them as a list"""
         tups = [(rect[0]+rect[2]*x, rect[1], rect[2], rect[3])
                 for x in range(image_count)]
-        return self.images_at(tups, colorkey)
+        return self.images_at(tups, colorkey, zero_copy)
+
+    def load_grid(self, rows, cols):
+        """Slices the whole sheet into rows x cols images, row by row.
+
+        The images are subsurfaces sharing the sheet pixels, so no pixels are copied.
+        """
+        width = self.sheet.get_width() // cols
+        height = self.sheet.get_height() // rows
+        return [
+            self.sheet.subsurface((col * width, row * height, width, height))
+            for row in range(rows)
+            for col in range(cols)
+        ]
@@ -0,0 +1,251 @@
+import numpy
+import pygame
+
+from level_format import read_map
+
+
+# Amount of tiles on each side of a pre-rendered chunk
+CHUNK_SIZE = 16
+
+
+class Tileset:
+    def __init__(self, firstgid, tile_width, tile_height, tilecount, columns, image):
+        self.firstgid = firstgid
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.tilecount = tilecount
+        self.columns = columns
+        self.image = pygame.image.load(image).convert_alpha()
+        self._tiles = {}
+
+    def __contains__(self, gid):
+        return self.firstgid <= gid < self.firstgid + self.tilecount
+
+    def get_tile(self, gid):
+        """Returns the tile image for gid as a subsurface of the tileset image."""
+        tile = self._tiles.get(gid)
+        if tile is None:
+            local_id = gid - self.firstgid
+            x = (local_id % self.columns) * self.tile_width
+            y = (local_id // self.columns) * self.tile_height
+            tile = self.image.subsurface((x, y, self.tile_width, self.tile_height))
+            self._tiles[gid] = tile
+        return tile
+
+
+class TileMap:
+    """Loads a level map and renders it in pre-baked chunks.
+
+    The map can be a Tiled .tmx map with CSV layers, a Tiled .json map or a
+    compiled level, see level_format. Every layer is drawn once into chunk
+    surfaces of CHUNK_SIZE x CHUNK_SIZE tiles at load time, so drawing the map
+    is a handful of large blits for the chunks that intersect the camera
+    instead of one blit per tile.
+    """
+    def __init__(self, filename, chunk_size=CHUNK_SIZE):
+        map_data = read_map(filename)
+        self.width = map_data['width']
+        self.height = map_data['height']
+        self.tile_width = map_data['tile_width']
+        self.tile_height = map_data['tile_height']
+        self.chunk_size = chunk_size
+        self.chunk_width = chunk_size * self.tile_width
+        self.chunk_height = chunk_size * self.tile_height
+
+        self.tilesets = [Tileset(**tileset) for tileset in map_data['tilesets']]
+
+        # Layers are kept in drawing order as height x width uint16 arrays of gids,
+        # sharing the memory of the loaded arrays
+        self.layers = {
+            name: numpy.frombuffer(layer, dtype=numpy.uint16).reshape(self.height, self.width)
+            for name, layer in map_data['layers'].items()
+        }
+        self.collision_masks = {
+            name: numpy.frombuffer(mask, dtype=numpy.uint8).reshape(self.height, self.width).astype(bool)
+            for name, mask in map_data['collision_masks'].items()
+        }
+        # Merged solid rects of each layer and the index of the rect covering
+        # every tile, -1 for empty tiles, built on first use
+        self._merged_solids = {}
+
+        self.chunks = {}
+        self._bake_chunks(0, 0, self.width, self.height)
+
+    @property
+    def pixel_size(self):
+        return self.width * self.tile_width, self.height * self.tile_height
+
+    def get_tile_image(self, gid):
+        for tileset in self.tilesets:
+            if gid in tileset:
+                return tileset.get_tile(gid)
+        raise ValueError("No tileset found for gid {}".format(gid))
+
+    def _get_tile_rect(self, x, y):
+        return pygame.Rect(x * self.tile_width, y * self.tile_height, self.tile_width, self.tile_height)
+
+    def get_cell_range(self, rect):
+        """Returns the (rows, columns) slices of the tiles that rect overlaps, clamped to the map."""
+        rect = pygame.Rect(rect)
+        first_x = max(rect.left // self.tile_width, 0)
+        first_y = max(rect.top // self.tile_height, 0)
+        last_x = min((max(rect.right, rect.left + 1) - 1) // self.tile_width + 1, self.width)
+        last_y = min((max(rect.bottom, rect.top + 1) - 1) // self.tile_height + 1, self.height)
+        return slice(first_y, max(last_y, first_y)), slice(first_x, max(last_x, first_x))
+
+    def get_visible_tiles(self, layer_name, camera_rect):
+        """Returns the gids of a layer under camera_rect, as a view of the layer array."""
+        rows, cols = self.get_cell_range(camera_rect)
+        return self.layers[layer_name][rows, cols]
+
+    def get_collision_mask(self, layer_name):
+        """Returns a height x width boolean array, True where a layer has a solid tile.
+
+        Compiled levels ship the masks precomputed, other maps build them on first use.
+        """
+        mask = self.collision_masks.get(layer_name)
+        if mask is None:
+            mask = self.layers[layer_name] != 0
+            self.collision_masks[layer_name] = mask
+        return mask
+
+    def is_solid(self, layer_name, rect):
+        """Returns whether rect overlaps any solid tile of a layer."""
+        rows, cols = self.get_cell_range(rect)
+        return bool(self.get_collision_mask(layer_name)[rows, cols].any())
+
+    def get_solid_rects(self, layer_name, rect):
+        """Returns the rects of the solid tiles of a layer that rect overlaps."""
+        rows, cols = self.get_cell_range(rect)
+        ys, xs = numpy.nonzero(self.get_collision_mask(layer_name)[rows, cols])
+        return [self._get_tile_rect(x, y) for y, x in zip(ys + rows.start, xs + cols.start)]
+
+    def _merge_solid_tiles(self, layer_name):
+        # Internal method. Greedily covers the solid tiles of a layer with as few
+        # rects as possible: from the first uncovered tile in reading order, a rect
+        # grows right as far as the row stays solid, then down as long as every
+        # tile under it is solid too.
+        mask = self.get_collision_mask(layer_name).copy()
+        owners = numpy.full(mask.shape, -1, dtype=numpy.int32)
+        rects = []
+        for y, x in numpy.argwhere(mask):
+            if not mask[y, x]:
+                continue
+            row = mask[y, x:]
+            width = len(row) if row.all() else int(numpy.argmin(row))
+            height = 1
+            while y + height < self.height and mask[y + height, x:x + width].all():
+                height += 1
+            mask[y:y + height, x:x + width] = False
+            owners[y:y + height, x:x + width] = len(rects)
+            rects.append(pygame.Rect(
+                x * self.tile_width, y * self.tile_height, width * self.tile_width, height * self.tile_height
+            ))
+        return rects, owners
+
+    def get_merged_solid_rects(self, layer_name, rect=None):
+        """Returns the merged rects covering the solid tiles of a layer.
+
+        Adjacent solid tiles are merged into larger rects once, when first
+        needed, so a long floor collides as a single rect instead of one per
+        tile. If rect is given, only the merged rects over the tiles it touches
+        are returned.
+        """
+        merged = self._merged_solids.get(layer_name)
+        if merged is None:
+            merged = self._merge_solid_tiles(layer_name)
+            self._merged_solids[layer_name] = merged
+        rects, owners = merged
+        if rect is None:
+            return list(rects)
+
+        row_range, col_range = self.get_cell_range(rect)
+        ids = numpy.unique(owners[row_range, col_range])
+        return [rects[i] for i in ids[ids >= 0]]
+
+    def get_solid_outline(self, layer_name):
+        """Returns the outline of the solid tiles of a layer as ((x1, y1), (x2, y2)) pixel segments.
+
+        Edges between a solid and an empty tile, or the map border, are merged
+        into the longest horizontal and vertical runs, so a flat floor is a
+        single segment however many tiles wide it is.
+        """
+        mask = self.get_collision_mask(layer_name)
+        segments = []
+        # Rows of horizontal edges, between the tile rows, and columns of vertical edges
+        horizontal = numpy.diff(numpy.pad(mask, ((1, 1), (0, 0))).astype(numpy.int8), axis=0) != 0
+        vertical = numpy.diff(numpy.pad(mask, ((0, 0), (1, 1))).astype(numpy.int8), axis=1) != 0
+
+        runs = numpy.diff(numpy.pad(horizontal, ((0, 0), (1, 1))).astype(numpy.int8), axis=1)
+        for (y, start), (_, end) in zip(numpy.argwhere(runs == 1), numpy.argwhere(runs == -1)):
+            y *= self.tile_height
+            segments.append(((int(start) * self.tile_width, int(y)), (int(end) * self.tile_width, int(y))))
+
+        runs = numpy.diff(numpy.pad(vertical.T, ((0, 0), (1, 1))).astype(numpy.int8), axis=1)
+        for (x, start), (_, end) in zip(numpy.argwhere(runs == 1), numpy.argwhere(runs == -1)):
+            x *= self.tile_width
+            segments.append(((int(x), int(start) * self.tile_height), (int(x), int(end) * self.tile_height)))
+        return segments
+
+    def fill(self, layer_name, cell_rect, gid):
+        """Sets every tile of a layer inside cell_rect, given in tiles, to gid.
+
+        The collision mask and the chunks under the region are updated to match.
+        """
+        x, y, width, height = cell_rect
+        rows = slice(max(y, 0), max(min(y + height, self.height), 0))
+        cols = slice(max(x, 0), max(min(x + width, self.width), 0))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            # The region is entirely outside the map
+            return
+        self.layers[layer_name][rows, cols] = gid
+        if layer_name in self.collision_masks:
+            self.collision_masks[layer_name][rows, cols] = gid != 0
+        self._merged_solids.pop(layer_name, None)
+        self._bake_chunks(cols.start, rows.start, cols.stop, rows.stop)
+
+    def _bake_chunks(self, first_x, first_y, last_x, last_y):
+        # Internal method. Draws every layer into the chunk surfaces that cover
+        # the tiles from (first_x, first_y) up to (last_x, last_y), leaving out
+        # chunks that don't contain any tiles.
+        for chunk_y in range(first_y // self.chunk_size, -(-last_y // self.chunk_size)):
+            for chunk_x in range(first_x // self.chunk_size, -(-last_x // self.chunk_size)):
+                rows = slice(chunk_y * self.chunk_size, (chunk_y + 1) * self.chunk_size)
+                cols = slice(chunk_x * self.chunk_size, (chunk_x + 1) * self.chunk_size)
+                blit_sequence = []
+                for layer in self.layers.values():
+                    block = layer[rows, cols]
+                    for row, col in zip(*numpy.nonzero(block)):
+                        blit_sequence.append((
+                            self.get_tile_image(int(block[row, col])),
+                            (col * self.tile_width, row * self.tile_height)
+                        ))
+
+                if blit_sequence:
+                    surface = pygame.Surface((self.chunk_width, self.chunk_height), pygame.SRCALPHA).convert_alpha()
+                    surface.blits(blit_sequence, doreturn=False)
+                    self.chunks[(chunk_x, chunk_y)] = surface
+                else:
+                    self.chunks.pop((chunk_x, chunk_y), None)
+
+    def draw(self, surface, camera_rect, area=None):
+        """Blits the chunks that intersect camera_rect, offset by the camera position.
+
+        If area is given, only the chunks under that part of the screen are blitted.
+        """
+        view = camera_rect if area is None else area.move(camera_rect.topleft)
+        first_x = max(view.left // self.chunk_width, 0)
+        first_y = max(view.top // self.chunk_height, 0)
+        last_x = (view.right - 1) // self.chunk_width
+        last_y = (view.bottom - 1) // self.chunk_height
+
+        blit_sequence = []
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is not None:
+                    blit_sequence.append((chunk, (
+                        chunk_x * self.chunk_width - camera_rect.left,
+                        chunk_y * self.chunk_height - camera_rect.top
+                    )))
+        surface.blits(blit_sequence, doreturn=False)
@@ -1,14 +1,94 @@
+import json
 import os
 from pathlib import Path
 from typing import Union
 
 
 ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+INDEX_FILE = os.path.join(ROOT_DIR, '.cache', 'assets.json')
+
+# Directories that never hold game assets
+IGNORED_DIRS = {'__pycache__', 'venv', 'env', 'site-packages', 'node_modules'}
+
+
+class AssetResolver:
+    """Answers filename lookups from an index of every file under root.
+
+    The index is built with a single walk that skips hidden directories (.git,
+    .cache, ...) and virtualenvs. When index_file is given, the index is also
+    written there and reused by later runs as long as the modification time of
+    every indexed directory is unchanged.
+    """
+    def __init__(self, root=ROOT_DIR, index_file=None):
+        self.root = root
+        self.index_file = index_file
+        self._files = None
+        self._dirs = None
+
+    def _is_ignored(self, dirpath, dirname):
+        return (
+            dirname.startswith('.')
+            or dirname in IGNORED_DIRS
+            or os.path.exists(os.path.join(dirpath, dirname, 'pyvenv.cfg'))
+        )
+
+    def _build_index(self):
+        # Internal method. Walks root, mapping each filename to every relative path that has it.
+        files = {}
+        dirs = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [dirname for dirname in dirnames if not self._is_ignored(dirpath, dirname)]
+            relative_dir = os.path.relpath(dirpath, self.root)
+            dirs[relative_dir] = os.stat(dirpath).st_mtime_ns
+            for filename in filenames:
+                files.setdefault(filename, []).append(os.path.join(relative_dir, filename))
+        self._files = files
+        self._dirs = dirs
+
+    def _load_index(self):
+        # Internal method. Loads the persisted index, returning False if it's missing or stale.
+        try:
+            with open(self.index_file) as file:
+                index = json.load(file)
+            for relative_dir, mtime in index['dirs'].items():
+                if os.stat(os.path.join(self.root, relative_dir)).st_mtime_ns != mtime:
+                    return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self._files = index['files']
+        self._dirs = index['dirs']
+        return True
+
+    def _save_index(self):
+        # Internal method. Persists the index, ignoring a read-only tree.
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(self.index_file, 'w') as file:
+                json.dump({'dirs': self._dirs, 'files': self._files}, file)
+        except OSError:
+            pass
+
+    def refresh(self):
+        """Rebuilds the index from disk."""
+        self._build_index()
+        if self.index_file is not None:
+            self._save_index()
+
+    def find(self, filename: Union[str, Path]):
+        if self._files is None:
+            if self.index_file is None or not self._load_index():
+                self.refresh()
+
+        paths = self._files.get(os.fspath(filename))
+        if not paths:
+            raise FileNotFoundError("File not found!")
+        if len(paths) > 1:
+            raise ValueError("Ambiguous filename {}, found in: {}".format(filename, ", ".join(paths)))
+        return os.path.normpath(os.path.join(self.root, paths[0]))
+
+
+resolver = AssetResolver(index_file=INDEX_FILE)
 
 
 def find_file(filename: Union[str, Path]):
-    for root, _, files in os.walk(ROOT_DIR):
-        if filename in files:
-            return os.path.join(root, filename)
-    else:
-        raise FileNotFoundError("File not found!")
+    return resolver.find(filename)